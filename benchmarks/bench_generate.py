@@ -0,0 +1,225 @@
+"""
+Offline benchmark of nowde. `genai.GenerativeModel` is swapped for a deterministic stand-in that
+returns a recorded plan, so the whole pipeline runs without network access or an API key.
+
+    python benchmarks/bench_generate.py --sizes 10 --sizes 100 --sizes 1000 --output bench.json
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import threading
+import tracemalloc
+from time import perf_counter
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import click
+import google.generativeai as genai
+import lib.generate as generate
+import lib.executor as executor
+
+ENDPOINTS_PER_CONTROLLER = 10
+
+"""
+Returns a synthetic plan with one service and one route per endpoint, grouped into controllers.
+npm and prettier steps are only included on request since they measure the network, not nowde.
+"""
+def make_plan(endpoints, with_npm=False):
+    services = [f"getResource{i}" for i in range(endpoints)]
+    controllers = sorted({f"resource{i // ENDPOINTS_PER_CONTROLLER}" for i in range(endpoints)}, key=lambda c: int(c[8:]))
+    plan = [{"name": "create_project_folder", "args": {"project_name": "bench_api"}}]
+    if with_npm:
+        plan.append({"name": "install_dependencies", "args": {"project_name": "bench_api"}})
+    plan.append({"name": "generate_entrypoint", "args": {}})
+    plan.append({"name": "generate_services_index", "args": {"service_names": services}})
+    plan.append({"name": "generate_controller_index", "args": {"controller_names": controllers}})
+    for i, service in enumerate(services):
+        plan.append({"name": "generate_service", "args": {"service_name": service, "uri": f"https://api.example.com/resource{i}/${{params.id}}"}})
+    for i, service in enumerate(services):
+        plan.append({"name": "generate_controller", "args": {"controller_name": f"resource{i // ENDPOINTS_PER_CONTROLLER}", "services": [service], "endpoint": f"/item{i}/:id"}})
+    if with_npm:
+        plan.append({"name": "format_files", "args": {}})
+    return plan
+
+
+class FakeFunctionCall:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    @classmethod
+    def to_dict(cls, fn):
+        return {"name": fn.name, "args": json.loads(json.dumps(fn.args))}
+
+
+class FakePart:
+    def __init__(self, step):
+        self.function_call = FakeFunctionCall(step["name"], step.get("args") or {})
+
+
+class FakeResponse:
+    def __init__(self, plan):
+        self.parts = [FakePart(step) for step in plan]
+
+    def __repr__(self):
+        return f"FakeResponse({len(self.parts)} parts)"
+
+
+"""
+Stand in for `genai.GenerativeModel` that answers every request with the scripted plan.
+"""
+class FakeGenerativeModel:
+    plan = []
+    calls = 0
+
+    def __init__(self, model_name=None, tools=None, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt):
+        FakeGenerativeModel.calls += 1
+        return FakeResponse(FakeGenerativeModel.plan)
+
+
+"""
+Wraps `execute_function` and the controller writer to record time spent per function. Steps run on a
+thread pool, so the summed time of a function can exceed the end to end time.
+"""
+class FunctionTimer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+
+    def record(self, name, seconds):
+        with self.lock:
+            count, total = self.timings.get(name, (0, 0.0))
+            self.timings[name] = (count + 1, total + seconds)
+
+    def wrap(self, fn, name=None):
+        def wrapped(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name or args[0], perf_counter() - start)
+        return wrapped
+
+    def report(self):
+        return {name: {"calls": count, "seconds": round(total, 6)} for name, (count, total) in sorted(self.timings.items())}
+
+
+def count_files(root):
+    files = 0
+    size = 0
+    for current, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in ('node_modules', '.nowde')]
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(current, name))
+    return files, size
+
+
+"""
+Runs one end to end generation into a fresh directory and returns its measurements.
+"""
+def run_once(plan, trace_memory=False, workers=None):
+    work_dir = tempfile.mkdtemp(prefix='nowde-bench-')
+    context_dir = os.path.join(work_dir, 'context')
+    output_dir = os.path.join(work_dir, 'output')
+    os.makedirs(context_dir)
+    os.makedirs(output_dir)
+    with open(os.path.join(context_dir, 'description.txt'), 'w') as f:
+        f.write("A proxy API for the example.com resources.\n")
+
+    FakeGenerativeModel.plan = plan
+    FakeGenerativeModel.calls = 0
+    timer = FunctionTimer()
+    original_execute = generate.execute_function
+    original_hook = executor.STAGE_HOOKS['controllers']
+    generate.execute_function = timer.wrap(original_execute)
+    executor.STAGE_HOOKS['controllers'] = timer.wrap(original_hook, 'write_controllers')
+
+    if trace_memory:
+        tracemalloc.start()
+    start = perf_counter()
+    try:
+        generate.run(context_dir, output_dir=output_dir, workers=workers, use_cache=False)
+        seconds = perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        generate.execute_function = original_execute
+        executor.STAGE_HOOKS['controllers'] = original_hook
+
+    files, size = count_files(output_dir)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "seconds": seconds,
+        "model_calls": FakeGenerativeModel.calls,
+        "files_written": files,
+        "bytes_written": size,
+        "functions": timer.report(),
+        "peak_python_bytes": peak,
+    }
+
+
+@click.command()
+@click.option('--sizes', type=int, multiple=True, default=[10, 100, 1000], help='Number of endpoints in each benchmarked plan')
+@click.option('--plan', 'plan_files', type=click.Path(exists=True, dir_okay=False), multiple=True, help='Recorded plan to benchmark in addition to the synthetic ones')
+@click.option('--repeat', type=int, default=3, help='Timed runs per plan')
+@click.option('--workers', type=int, default=None, help='Threads used to execute the plan')
+@click.option('--with-npm', is_flag=True, default=False, help='Include install_dependencies and format_files steps')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Write the JSON results to this file instead of stdout')
+def main(sizes, plan_files, repeat, workers, with_npm, output):
+    logging.basicConfig(level=logging.WARNING)
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.configure = lambda **kwargs: None
+    # The Gemini backend checks for a key before the stand in is used; it is never sent anywhere.
+    os.environ.setdefault('GOOGLE_API_KEY', 'offline-benchmark')
+
+    plans = [(f"synthetic_{size}", make_plan(size, with_npm)) for size in sizes]
+    for plan_file in plan_files:
+        with open(plan_file, 'r') as f:
+            plans.append((os.path.basename(plan_file), json.load(f)))
+
+    results = []
+    for name, plan in plans:
+        runs = [run_once(plan, workers=workers) for _ in range(repeat)]
+        memory = run_once(plan, trace_memory=True, workers=workers)
+        fastest = min(runs, key=lambda r: r["seconds"])
+        result = {
+            "name": name,
+            "steps": len(plan),
+            "endpoints": sum(1 for step in plan if step["name"] == 'generate_service'),
+            "seconds_min": round(fastest["seconds"], 6),
+            "seconds_median": round(median(r["seconds"] for r in runs), 6),
+            "model_calls": fastest["model_calls"],
+            "files_written": fastest["files_written"],
+            "bytes_written": fastest["bytes_written"],
+            "peak_python_bytes": memory["peak_python_bytes"],
+            "functions": fastest["functions"],
+        }
+        results.append(result)
+        click.echo(f"{name}: {result['seconds_min']:.3f}s, {result['files_written']} files, peak {result['peak_python_bytes'] / 1024 / 1024:.1f} MiB", err=True)
+
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        max_rss = None
+
+    report = {"python": sys.version.split()[0], "repeat": repeat, "max_rss": max_rss, "results": results}
+    data = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(data)
+    else:
+        click.echo(data)
+
+
+if __name__ == '__main__':
+    main()
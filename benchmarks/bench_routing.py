@@ -0,0 +1,129 @@
+"""
+Routing latency benchmark of the generated API. Builds the route table the generated controllers and
+index would, with 10 routes per controller, once with express routers and once with the generated
+radix router, and times how long each takes to dispatch a request to its handler in node. Handlers
+respond immediately, so only routing is measured.
+
+    python benchmarks/bench_routing.py --sizes 10 --sizes 1000 --sizes 10000 --output routing.json
+
+express is taken from the dependency skeleton cache, or from `--node-modules`.
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import click
+from lib.api_builder import DEPENDENCIES
+from lib.cache import DEFAULT_CACHE_DIR
+from lib.skeleton import ensure_skeleton
+from lib.templates import render
+
+ROUTES_PER_CONTROLLER = 10
+
+DRIVER = r'''
+import express from "express";
+import { createRouter } from "./router.js";
+
+const [sizes, requests, perController] = process.argv.slice(2).map((v) => JSON.parse(v));
+
+const build = (createController, routes) => {
+  const index = createController();
+  for (let start = 0; start < routes; start += perController) {
+    const controller = createController();
+    for (let i = start; i < Math.min(start + perController, routes); i++) {
+      controller.get(`/item${i}/:id`, (req, res) => res.done(req.params.id));
+    }
+    index.use(`/resource${start / perController}`, controller);
+  }
+  return index;
+};
+
+const dispatch = (router, url) => new Promise((resolve, reject) => {
+  const req = { method: "GET", url };
+  router(req, { done: resolve }, (error) => reject(error || new Error(`No route for ${url}`)));
+});
+
+const percentile = (sorted, p) => sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))];
+
+const results = [];
+for (const routes of sizes) {
+  const urls = Array.from({ length: requests }, (_, n) => {
+    const i = (n * 7919) % routes;
+    return `/resource${Math.floor(i / perController)}/item${i}/${n}`;
+  });
+  const routers = { express: () => express.Router(), radix: createRouter };
+  for (const [name, createController] of Object.entries(routers)) {
+    const buildStart = process.hrtime.bigint();
+    const router = build(createController, routes);
+    await dispatch(router, urls[0]);
+    const buildMs = Number(process.hrtime.bigint() - buildStart) / 1e6;
+
+    for (const url of urls.slice(0, Math.min(1000, requests))) {
+      await dispatch(router, url);
+    }
+    const latencies = [];
+    for (const url of urls) {
+      const start = process.hrtime.bigint();
+      await dispatch(router, url);
+      latencies.push(Number(process.hrtime.bigint() - start) / 1e3);
+    }
+    latencies.sort((a, b) => a - b);
+    const mean = latencies.reduce((sum, value) => sum + value, 0) / latencies.length;
+    results.push({
+      routes,
+      router: name,
+      build_ms: +buildMs.toFixed(3),
+      mean_us: +mean.toFixed(3),
+      p50_us: +percentile(latencies, 0.5).toFixed(3),
+      p99_us: +percentile(latencies, 0.99).toFixed(3),
+    });
+  }
+}
+console.log(JSON.stringify({ node: process.version, results }));
+'''
+
+
+@click.command()
+@click.option('--sizes', type=int, multiple=True, default=[10, 1000, 10000], help='Number of routes in each benchmarked route table')
+@click.option('--requests', type=int, default=20000, help='Timed requests per route table and router')
+@click.option('--node-modules', type=click.Path(exists=True, file_okay=False), default=None, help='node_modules directory providing express, instead of the skeleton cache')
+@click.option('--cache-dir', default=DEFAULT_CACHE_DIR, help='Directory of the dependency skeleton cache')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Write the JSON results to this file instead of stdout')
+def main(sizes, requests, node_modules, cache_dir, output):
+    if node_modules is None:
+        node_modules = os.path.join(ensure_skeleton(DEPENDENCIES, cache_dir), 'node_modules')
+
+    work_dir = tempfile.mkdtemp(prefix='nowde-routing-')
+    try:
+        os.symlink(os.path.abspath(node_modules), os.path.join(work_dir, 'node_modules'))
+        with open(os.path.join(work_dir, 'package.json'), 'w') as f:
+            json.dump({"type": "module"}, f)
+        with open(os.path.join(work_dir, 'router.js'), 'w') as f:
+            f.write(render('radix_router'))
+        with open(os.path.join(work_dir, 'bench.js'), 'w') as f:
+            f.write(DRIVER)
+        result = subprocess.run(['node', 'bench.js', json.dumps(list(sizes)), str(requests), str(ROUTES_PER_CONTROLLER)], cwd=work_dir, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if result.returncode != 0:
+        raise click.ClickException(f"Routing benchmark failed:\n{result.stderr[-2000:]}")
+
+    report = {"python": sys.version.split()[0], "requests": requests, **json.loads(result.stdout)}
+    for row in report["results"]:
+        click.echo(f"{row['routes']:>6} routes  {row['router']:<8} p50 {row['p50_us']:>9.2f}us  p99 {row['p99_us']:>9.2f}us  build {row['build_ms']:.1f}ms", err=True)
+
+    data = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(data)
+    else:
+        click.echo(data)
+
+
+if __name__ == '__main__':
+    main()
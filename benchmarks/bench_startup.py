@@ -0,0 +1,96 @@
+"""
+Startup benchmark of the nowde CLI. Runs `main.py --help` and a replay of a small recorded plan in
+fresh interpreters with `-X importtime`, and reports the wall time and the heavy modules each imported.
+
+    python benchmarks/bench_startup.py --repeat 5 --output startup.json
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+from time import perf_counter
+from statistics import median
+
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that dominate import time when loaded. None of them should be needed for --help or a replay.
+HEAVY_MODULES = ['google.generativeai', 'inflect']
+
+PLAN = [
+    {"name": "create_project_folder", "args": {"project_name": "startup_api"}},
+    {"name": "generate_service", "args": {"service_name": "getUser", "uri": "https://api.example.com/users/${params.id}"}},
+    {"name": "generate_services_index", "args": {"service_names": ["getUser"]}},
+]
+
+
+"""
+Returns the modules imported by the interpreter, parsed from the `-X importtime` output, with their
+cumulative import time in seconds.
+"""
+def parse_importtime(stderr):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative) / 1_000_000
+    return modules
+
+
+def run_once(args, env):
+    start = perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', os.path.join(ROOT, 'main.py'), *args], cwd=ROOT, env=env, capture_output=True, text=True)
+    seconds = perf_counter() - start
+    if result.returncode != 0:
+        raise click.ClickException(f"main.py {' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    modules = parse_importtime(result.stderr)
+    return seconds, {name: round(modules[name], 6) for name in HEAVY_MODULES if name in modules}
+
+
+@click.command()
+@click.option('--repeat', type=int, default=5, help='Runs per command')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Write the JSON results to this file instead of stdout')
+def main(repeat, output):
+    work_dir = tempfile.mkdtemp(prefix='nowde-startup-')
+    plan_path = os.path.join(work_dir, 'plan.json')
+    with open(plan_path, 'w') as f:
+        json.dump(PLAN, f)
+    os.makedirs(os.path.join(work_dir, 'context'))
+    env = {key: value for key, value in os.environ.items() if key != 'GOOGLE_API_KEY'}
+
+    commands = [
+        ('help', ['--help']),
+        ('replay', ['--replay', plan_path, '--context', os.path.join(work_dir, 'context'), '--output', os.path.join(work_dir, 'output'), '--offline']),
+    ]
+    results = []
+    try:
+        for name, args in commands:
+            runs = [run_once(args, env) for _ in range(repeat)]
+            seconds = [run[0] for run in runs]
+            result = {
+                "name": name,
+                "seconds_min": round(min(seconds), 6),
+                "seconds_median": round(median(seconds), 6),
+                "heavy_imports": runs[-1][1],
+            }
+            results.append(result)
+            click.echo(f"{name}: {result['seconds_min']:.3f}s, imported {', '.join(result['heavy_imports']) or 'no heavy modules'}", err=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {"python": sys.version.split()[0], "repeat": repeat, "results": results}
+    data = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(data)
+    else:
+        click.echo(data)
+
+
+if __name__ == '__main__':
+    main()
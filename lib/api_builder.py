@@ -1,220 +1,283 @@
 import os
 import logging
 import json
-import inflect
-from time import sleep
+import subprocess
+from .project import Project
+from .controller import INVOKE_SERVICES_PATH, RADIX_ROUTER_PATH, get_router_source
+from .config import get_cache_ttl
+from .cache import DEFAULT_CACHE_DIR
+from .skeleton import ensure_skeleton, materialize_skeleton
+from .tracing import span
+from .routes import build_route_table, check_radix_endpoint
+from .templates import render, identifier, string, template_literal, named_import, call, local_names
 
 logger = logging.getLogger(__name__)
 
-def create_project_folder(project_name="node_api"):
+DEPENDENCIES = ['express', 'helmet', 'cors', 'nodemon']
+
+HTTP_CLIENT_PATH = 'src/lib/httpClient.js'
+RESPONSE_CACHE_PATH = 'src/lib/cache.js'
+
+PRETTIER_EXTENSIONS = ('.js', '.json')
+# Files passed to a single prettier invocation, to stay well below the command line length limit.
+PRETTIER_BATCH = 500
+
+"""
+Removes files no longer produced by the plan and saves the manifest for the next run.
+"""
+def finalize_project(project):
+    project.manifest.remove_orphans()
+    project.manifest.save()
+    logger.info(f"Project finalized. {len(project.manifest.written)} of {len(project.manifest.files)} generated files changed.")
+
+def create_project_folder(project_name="node_api", output_dir='.', options=None):
     logger.info(f"Creating project folder: {project_name}")
+    root = os.path.join(output_dir, project_name)
     try:
-        os.makedirs(project_name, exist_ok=True)
-        os.makedirs(f'{project_name}/src', exist_ok=True)
+        os.makedirs(root, exist_ok=True)
+        os.makedirs(f'{root}/src', exist_ok=True)
     except Exception as e:
         logger.error(f"Error creating project folder: {e}")
 
-    os.chdir(project_name)
     logger.info("Project folder created successfully.")
+    return Project(root, options)
 
-def install_dependencies(project_name="node_api"):
-    os.system('npm init -y')
-    os.system('npm install express helmet cors nodemon')
-    with open('package.json', 'r') as f:
-        package_data = json.load(f)
-    package_data["type"] = "module"
-    package_data["name"] = project_name
-    package_data["main"] = "src/index.js"
-    package_data["scripts"] = {
-        "start": "node src/index.js",
-        "dev": "nodemon src/index.js"
+def install_dependencies(project, project_name="node_api"):
+    inputs = {"project_name": project_name, "dependencies": DEPENDENCIES}
+    if project.manifest.step_is_current('install_dependencies', inputs) and os.path.exists(project.path('package.json')) and os.path.isdir(project.path('node_modules')):
+        logger.info("Dependencies unchanged, skipping npm install.")
+        project.manifest.record_step('install_dependencies', inputs)
+        return
+
+    skeleton = ensure_skeleton(DEPENDENCIES, project.options.get('cache_dir', DEFAULT_CACHE_DIR), project.options.get('offline', False))
+    dependencies = materialize_skeleton(skeleton, project.root)
+
+    package_data = {
+        "name": project_name,
+        "version": "1.0.0",
+        "type": "module",
+        "main": "src/index.js",
+        "scripts": {
+            "start": "node src/index.js",
+            "dev": "nodemon src/index.js"
+        },
+        "keywords": [],
+        "author": "",
+        "license": "ISC",
+        "description": "",
+        "dependencies": dependencies
     }
-    with open('package.json', 'w') as f:
+    with open(project.path('package.json'), 'w') as f:
         json.dump(package_data, f, indent=2)
+    project.manifest.record_step('install_dependencies', inputs)
 
 
-def format_files():
-    # use prettier to format the node_api directory recursively
-    os.system('npx prettier --write ./')
+"""
+Runs prettier over the files written by this run. Generated files are already formatted, so this
+only runs when enabled with the `prettier` option, e.g. to apply a project's own prettier config.
+"""
+def format_files(project):
+    if not project.options.get('prettier'):
+        logger.info("Generated files are already formatted, skipping prettier.")
+        return
+    files = [path for path in project.manifest.written if path.endswith(PRETTIER_EXTENSIONS)]
+    if not files:
+        logger.info("No generated files changed, skipping prettier.")
+        return
+    # Offline, npx may only use a prettier that is installed or in the npm cache.
+    npx = ['npx', '--offline'] if project.options.get('offline') else ['npx']
+    with span('npx prettier', 'subprocess', files=len(files)):
+        for start in range(0, len(files), PRETTIER_BATCH):
+            subprocess.run([*npx, 'prettier', '--write', *files[start:start + PRETTIER_BATCH]], cwd=project.root)
 
-def generate_entrypoint(port=3000, controller_path='controllers'):
+def generate_entrypoint(project, port=3000, controller_path='controllers', host=None, cluster=False, workers=None):
     logger.info("Generating entrypoint file.")
-
-    with open('src/index.js', 'w') as f:
-        f.write(f"""
-                import express from 'express';
-                import cors from 'cors';
-                import helmet from 'helmet';
-                import controllers from './{controller_path}/index.js';
-
-                const app = express();
-                const port = {port};
-
-                app.use(helmet());
-                app.use(cors());
-
-                app.use('/', controllers);
-
-                app.listen(port, () => {{
-                    console.log(`Server is running on http://localhost:${{port}}`);
-                }});
-        """)
+    project.makedirs('src')
+
+    imports = []
+    routes = []
+    if cluster:
+        imports.append('import os from "node:os";')
+        imports.append('import cluster from "node:cluster";')
+    imports.append(f"import controllers from {string(f'./{controller_path}/index.js')};")
+    if project.options.get('config', {}).get('cache', {}).get('enabled'):
+        imports.append('import { cacheStats } from "./lib/cache.js";')
+        routes.append('app.get("/_nowde/cache", (req, res) => res.json(cacheStats()));')
+
+    content = render(
+        'entrypoint',
+        imports=imports,
+        routes=routes,
+        port=int(port),
+        host=string(host) if host else 'undefined',
+        start=render('cluster', workers=int(workers or 0)) if cluster else 'startServer();',
+    )
+    args = {"port": port, "controller_path": controller_path, "host": host, "cluster": cluster, "workers": workers}
+    project.write('src/index.js', content, 'generate_entrypoint', args)
 
     logger.info("Node index file generated successfully.")
 
-def generate_controller_index(controller_names, controller_path='src/controllers'):
+"""
+Writes the controllers index, which mounts every controller at its path in `mounts`, or else at its
+route name. Uses a radix router
+instead of express if configured with `"routes": {"router": "radix"}`.
+"""
+def generate_controller_index(project, controller_names, controller_path='src/controllers', mounts=None):
     logger.info("Generating controller index file.")
 
-    os.makedirs(f'{controller_path}', exist_ok=True)
-
-    with open(f'{controller_path}/index.js', 'w') as f:
-        f.write("""
-        import express from 'express';
-        """)
-
-        for controller_name in controller_names:
-            f.write(f"import {controller_name} from './{controller_name}.js';\n")
-        f.write("\n")
-
-        f.write("const router = express.Router();\n")
+    project.makedirs(controller_path)
+
+    router = get_router(project)
+    route_table = build_route_table(controller_names, mounts)
+    taken = {'router'}
+    controllers = local_names([controller_name for controller_name, _ in route_table], taken)
+    router_import, router_expression = get_router_source(router, controller_path, taken)
+    imports = [router_import]
+    routes = []
+    for controller_name, route in route_table:
+        if router == 'radix':
+            check_radix_endpoint(route)
+        imports.append(f"import {controllers[controller_name]} from {string(f'./{controller_name}.js')};")
+        routes.append(f"router.use({string(route)}, {controllers[controller_name]});")
+
+    content = render('router', imports=imports, router=router_expression, routes=routes)
+    args = {"controller_names": controller_names, "controller_path": controller_path, "mounts": mounts}
+    project.write(f'{controller_path}/index.js', content, 'generate_controller_index', args)
+    logger.info("Controller index file generated successfully.")
 
-        f.write("\n")
+def generate_controller(project, controller_name, services, controller_path='src/controllers', method='GET', endpoint=None):
+    logger.info(f"Adding {method} {endpoint or '/'} to controller {controller_name}.")
 
-        unique_controller_names = []
+    if not services or len(services) == 0:
+        logger.error("No services found. Please create services first.")
+        return
 
-        for controller_name in controller_names:
-            # Convert from camel case to kebab case
-            route_name = ''.join(['-' + i.lower() if i.isupper() else i for i in controller_name]).lstrip('-')
-            # Remove "-controller" from the route name
-            route_name = route_name.replace('-controller', '')
-            route_name = route_name.replace('get-', '')
-            unique_controller_names.append(route_name)
+    project.controller(controller_name, controller_path).add_route(method, endpoint, services)
+
+"""
+Writes every controller collected while executing the plan, once per file, along with the helper
+they use to call their services.
+"""
+def write_controllers(project):
+    if project.controllers:
+        generate_invoke_services(project)
+    router = get_router(project)
+    if router == 'radix':
+        generate_radix_router(project)
+    # Routes keep the response wrapped by service name if configured, instead of streaming.
+    wrap = project.options.get('config', {}).get('routes', {}).get('wrap', False)
+    streams = set() if wrap else project.streams
+    for controller in project.controllers.values():
+        logger.info(f"Generating node controller file for {controller.name}.")
+        if router == 'radix':
+            for method, endpoint in controller.routes:
+                check_radix_endpoint(endpoint)
+        project.makedirs(controller.path)
+        project.write(f'{controller.path}/{controller.name}.js', controller.render(streams, router, wrap), 'generate_controller', controller.args())
+    logger.info(f"{len(project.controllers)} node controller files generated successfully.")
+
+def get_router(project):
+    return project.options.get('config', {}).get('routes', {}).get('router', 'express')
+
+"""
+Writes the radix tree router used instead of express routers by the controllers and their index.
+"""
+def generate_radix_router(project):
+    project.makedirs(os.path.dirname(RADIX_ROUTER_PATH))
+
+    content = render('radix_router')
+    project.write(RADIX_ROUTER_PATH, content, 'generate_radix_router', {})
+
+"""
+Writes the helper controllers use to call the services of a route. All services start at once, each
+one is limited to a timeout, and failed services are reported by name next to the results of the
+others instead of failing the whole route.
+"""
+def generate_invoke_services(project):
+    project.makedirs(os.path.dirname(INVOKE_SERVICES_PATH))
+
+    content = render('invoke_services')
+    project.write(INVOKE_SERVICES_PATH, content, 'generate_invoke_services', {})
+
+def generate_services_index(project, service_names, service_path='src/services'):
+    logger.info("Generating services index file.")
+    logger.info(f"Service path: {service_path}")
+    logger.info(f"Service names: {service_names}")
 
-        unique_singular_controller_names = []
-        p = inflect.engine()
-        for unique_name in unique_controller_names:
-            # make it singlur using inflect
-            singular_name = p.singular_noun(unique_name)
+    project.makedirs(service_path)
 
-            # if inflect is unable to find singular name, then use the unique name
-            if singular_name is False:
-                singular_name = unique_name
+    content = "".join(f"export * from {string(f'./{identifier(name)}/index.js')};\n" for name in service_names)
+    args = {"service_names": service_names, "service_path": service_path}
+    project.write(f'{service_path}/index.js', content, 'generate_services_index', args)
 
-            # if the singular name is unique, then use it
-            if singular_name not in unique_singular_controller_names:
-                logger.info(f"Unique name: {unique_name}, Singular name: {singular_name}")
-                unique_singular_controller_names.append(singular_name)
+    logger.info("Services index file generated successfully.")
 
-        for controller_name, route_name in zip(controller_names, unique_singular_controller_names):
-            f.write(f"router.use('/{route_name}', {controller_name});\n")
+"""
+Writes the modules shared by the generated services, once the services stage finishes.
+"""
+def write_service_helpers(project):
+    generate_http_client(project)
+    cache = project.options.get('config', {}).get('cache', {})
+    if cache.get('enabled'):
+        generate_response_cache(project, cache.get('maxEntries', 1000))
 
-        f.write("\n")
+"""
+Writes the in memory response cache used by services with a TTL. Entries are evicted least recently
+used first past `max_entries`, concurrent requests for the same key share one upstream call, and
+hits, misses and evictions are counted for the `/_nowde/cache` route.
+"""
+def generate_response_cache(project, max_entries=1000):
+    logger.info("Generating response cache file.")
 
-        f.write("export default router;")
-    logger.info("Controller index file generated successfully.")
+    project.makedirs(os.path.dirname(RESPONSE_CACHE_PATH))
 
-def generate_controller(controller_name, services, controller_path='src/controllers', method='GET', endpoint=None):
-    logger.info(f"Generating node controller file for {controller_name}.")
-    os.makedirs(f'{controller_path}', exist_ok=True)
+    content = render('response_cache', max_entries=int(max_entries))
+    project.write(RESPONSE_CACHE_PATH, content, 'generate_response_cache', {"max_entries": max_entries})
 
-    if not services or len(services) == 0:
-        logger.error("No services found. Please create services first.")
-        return
+    logger.info("Response cache file generated successfully.")
 
-    existing = ""
-
-    #  remove the export default from the original file, if it exists
-    controller_exists = os.path.exists(f'{controller_path}/{controller_name}.js')
-    if controller_exists:
-        with open(f'{controller_path}/{controller_name}.js', 'r') as f2:
-            lines = f2.readlines()
-        with open(f'{controller_path}/{controller_name}.js', 'w') as f2:
-            f2.writelines(lines[:-1])
-            existing = lines[:-1]
-
-    sleep(1)
-
-    with open(f'{controller_path}/{controller_name}.js', 'w') as f:
-        service_imports = []
-        for service in services:
-            service_imports.append(f"import {{ {service} }} from '../services/{service}/index.js';")
-
-        service_calls = []
-        for service_name in services:
-            service_calls.append(f"const {service_name}Data = await {service_name}({{params, body, query}});")
-            service_calls.append(f"finalData['{service_name}'] = {service_name}Data;")
-            service_calls.append("\n")
-
-        dyn_endpoint = endpoint if endpoint else '/'
-
-        if not controller_exists:
-            f.write(f"""
-                import express from 'express';
-                const router = express.Router();
-                {"".join(service_imports)}
-
-            """)
-        else:
-            f.write("".join(service_imports))
-            f.writelines(existing)
-
-        f.write(f"""
-
-            router.{method.lower()}('{dyn_endpoint}', async (req, res) => {{
-                const {{ params, body, query }} = req;
-                try {{
-                    let finalData = {{}};
-                    {"".join(service_calls)}
-                    res.json(finalData);
-                }} catch (error) {{
-                    res.status(500).json({{ error: error.message }});
-                }}
-            }});
-
-        """)
-
-        f.write("export default router;")
-
-    logger.info("Node controller file generated successfully.")
-    
-def generate_services_index(service_names, service_path='src/services'):
-    logger.info("Generating services index file.")
-    logger.info(f"Service path: {service_path}")
-    logger.info(f"Service names: {service_names}")
+"""
+Writes the HTTP client shared by every service. Requests reuse keep-alive connections from one agent
+per upstream origin, and the pool size and timeouts can be tuned with environment variables.
+"""
+def generate_http_client(project):
+    logger.info("Generating HTTP client file.")
 
-    os.makedirs(f'{service_path}', exist_ok=True)
+    project.makedirs(os.path.dirname(HTTP_CLIENT_PATH))
 
-    with open(f'{service_path}/index.js', 'w') as f:
-        for service_name in service_names:
-            f.write(f"export * from './{service_name}/index.js';\n")
+    content = render('http_client')
+    project.write(HTTP_CLIENT_PATH, content, 'generate_http_client', {})
 
-    logger.info("Services index file generated successfully.")
+    logger.info("HTTP client file generated successfully.")
 
-def generate_service(service_name, uri, service_path='src/services', method='GET'):
+def generate_service(project, service_name, uri, service_path='src/services', method='GET'):
     logger.info(f"Generating node service file for {service_name}.")
 
-    os.makedirs(f'{service_path}/{service_name}', exist_ok=True)
-
-    with open(f'{service_path}/{service_name}/index.js', 'w') as f:
-        f.write(f"""
-                export const {service_name} = async ({{params, body, query}}) => {{
-                        const search_query_string = new URLSearchParams(query).toString();
-
-                        try {{
-                            const response = await fetch(`{uri}` + search_query_string, {{
-                                method: '{method}',
-                                headers: {{
-                                    'Content-Type': 'application/json'
-                                }},
-                                body: JSON.stringify(body)
-                            }});
-
-                            return await response.json();
-                        }} catch (error) {{
-                            console.error(error);
-                            return {{ error: error.message }};
-                        }}
-                }};
-        """)
+    identifier(service_name)
+    project.makedirs(service_path, service_name)
+    service_dir = os.path.join(service_path, service_name)
+    client = os.path.relpath(HTTP_CLIENT_PATH, service_dir).replace(os.sep, '/')
+    values = {"uri": template_literal(uri), "method": string(method.upper())}
+
+    # Cached services wrap the upstream call, which is then named fetchServiceName.
+    ttl = get_cache_ttl(project.options.get('config'), service_name, method)
+    if ttl:
+        cache = os.path.relpath(RESPONSE_CACHE_PATH, service_dir).replace(os.sep, '/')
+        function_name = f"fetch{service_name[:1].upper()}{service_name[1:]}"
+        helpers = local_names(['request', 'cached'], {service_name, function_name})
+        imports = [named_import({'request': helpers['request']}, client), named_import({'cached': helpers['cached']}, cache)]
+        cached = call(helpers['cached'], [string(service_name), str(ttl), function_name], f"export const {service_name} = ;")
+        wrapper = render('cached_service', name=service_name, call=cached)
+        content = render('service', imports=imports, export='', name=function_name, wrapper=wrapper, request=helpers['request'], **values)
+    else:
+        # Uncached services can also be piped straight to the response by routes calling only them.
+        helpers = local_names(['request', 'proxy'], {service_name, f"{service_name}Stream"})
+        imports = [named_import(helpers, client)]
+        wrapper = render('stream_service', name=f"{service_name}Stream", proxy=helpers['proxy'], **values)
+        content = render('service', imports=imports, export='export ', name=service_name, wrapper=wrapper, request=helpers['request'], **values)
+        project.add_stream(service_name)
+
+    args = {"service_name": service_name, "uri": uri, "service_path": service_path, "method": method}
+    project.write(f'{service_path}/{service_name}/index.js', content, 'generate_service', args)
 
     logger.info("Node service file generated successfully.")
@@ -0,0 +1,87 @@
+import os
+import importlib
+from abc import ABC, abstractmethod
+
+DEFAULT_BACKEND = 'gemini'
+
+# Backend name and the module and class implementing it. Modules are only imported when selected, so
+# unused SDKs are never loaded. New modules must also be added to `hiddenimports` in main.spec.
+BACKENDS = {
+    'gemini': ('gemini', 'GeminiBackend'),
+    'openai': ('openai', 'OpenAIBackend'),
+    'file': ('file', 'FileBackend'),
+}
+
+class BackendError(Exception):
+    pass
+
+class MissingEnvironmentError(BackendError):
+    pass
+
+
+"""
+A model that turns a prompt into a plan by calling the declared functions.
+Declarations use a backend neutral JSON schema, each backend converts them to its own format.
+"""
+class Backend(ABC):
+    name = None
+    default_model = None
+
+    def __init__(self, model=None, endpoint=None):
+        self.model = model or self.default_model
+        self.endpoint = endpoint
+
+    """
+    Returns the environment variables that must be set to use the backend.
+    """
+    @classmethod
+    def required_env(cls, endpoint=None):
+        return []
+
+    """
+    Returns the URL of the server answering prompts, or None for the default server of the SDK.
+    """
+    def get_endpoint(self):
+        return self.endpoint
+
+    """
+    Identifies the model and server in plan cache keys, so plans of different backends, models and
+    servers, e.g. a local fake server, never mix.
+    """
+    def cache_id(self):
+        endpoint = self.get_endpoint()
+        return f"{self.name}:{self.model}" + (f"@{endpoint}" if endpoint else "")
+
+    """
+    Sets up the client with the function declarations, once before any prompt is sent.
+    """
+    @abstractmethod
+    def prepare(self, declarations):
+        pass
+
+    """
+    Sends the prompt and returns the plan, a list of `{"name", "args"}` steps, and the token usage
+    as a dict of `prompt_tokens`, `response_tokens` and `total_tokens` when the backend reports it.
+    Called concurrently from several threads.
+    """
+    @abstractmethod
+    def generate(self, prompt):
+        pass
+
+
+def get_backend_class(name):
+    if name not in BACKENDS:
+        raise BackendError(f"Unknown backend {name}, expected one of {', '.join(BACKENDS)}.")
+    module, cls = BACKENDS[name]
+    return getattr(importlib.import_module(f'.{module}', __name__), cls)
+
+
+"""
+Returns the backend, raising MissingEnvironmentError if an environment variable it requires is not set.
+"""
+def get_backend(name=DEFAULT_BACKEND, model=None, endpoint=None):
+    backend_class = get_backend_class(name)
+    missing = [var for var in backend_class.required_env(endpoint) if var not in os.environ]
+    if missing:
+        raise MissingEnvironmentError(f"Environment variable not set: {', '.join(missing)}")
+    return backend_class(model, endpoint)
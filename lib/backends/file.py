@@ -0,0 +1,53 @@
+import os
+import hashlib
+import logging
+from . import Backend, BackendError
+from ..cache import load_plan
+
+logger = logging.getLogger(__name__)
+
+"""
+Returns the SHA-256 of a plan file, or of the names and contents of the plans in a directory.
+"""
+def hash_plans(path):
+    digest = hashlib.sha256()
+    if path and os.path.isdir(path):
+        paths = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json'))
+    elif path and os.path.isfile(path):
+        paths = [path]
+    else:
+        paths = []
+    for plan_path in paths:
+        digest.update(os.path.basename(plan_path).encode('utf-8'))
+        with open(plan_path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+"""
+Answers with recorded plans instead of a model, for offline development and tests. The endpoint is a
+plan file answering every prompt, or a directory holding one plan per prompt named by the SHA-256 of
+the prompt, e.g. `<hash>.json`.
+"""
+class FileBackend(Backend):
+    name = 'file'
+    default_model = 'recorded'
+
+    """
+    Includes a hash of the recorded plans, so editing them is never answered with a stale cached plan.
+    """
+    def cache_id(self):
+        if getattr(self, 'digest', None) is None:
+            self.digest = hash_plans(self.endpoint)
+        return f"{self.name}:{os.path.abspath(self.endpoint or '')}:{self.digest}"
+
+    def prepare(self, declarations):
+        if not self.endpoint or not os.path.exists(self.endpoint):
+            raise BackendError("The file backend needs --endpoint set to a plan file or a directory of plans.")
+
+    def generate(self, prompt):
+        path = self.endpoint
+        if os.path.isdir(path):
+            path = os.path.join(path, f"{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}.json")
+        logger.info(f"Answering with the recorded plan {path}.")
+        return load_plan(path), {}
@@ -0,0 +1,78 @@
+import os
+import logging
+from . import Backend
+
+logger = logging.getLogger(__name__)
+
+"""
+Returns the Gemini schema for a JSON schema, as a dict accepted by `genai.protos.Schema`.
+"""
+def to_schema(genai, schema):
+    converted = {"type_": getattr(genai.protos.Type, schema["type"].upper())}
+    if "description" in schema:
+        converted["description"] = schema["description"]
+    if "items" in schema:
+        converted["items"] = to_schema(genai, schema["items"])
+    if "properties" in schema:
+        converted["properties"] = {name: to_schema(genai, value) for name, value in schema["properties"].items()}
+    if "required" in schema:
+        converted["required"] = schema["required"]
+    return genai.protos.Schema(**converted)
+
+
+def to_declaration(genai, declaration):
+    parameters = declaration.get("parameters")
+    return genai.protos.FunctionDeclaration(
+        name=declaration["name"],
+        description=declaration.get("description", ""),
+        parameters=to_schema(genai, parameters) if parameters else None,
+    )
+
+
+"""
+Converts a function call returned from the model into a plain, JSON serializable plan step.
+"""
+def to_plan_step(fn):
+    args = type(fn).to_dict(fn).get('args') or {}
+    return {"name": fn.name, "args": args}
+
+
+"""
+Google Gemini through `google.generativeai`. The endpoint, or GEMINI_API_ENDPOINT, points the client
+at another server, such as a local fake model server, over the REST transport.
+"""
+class GeminiBackend(Backend):
+    name = 'gemini'
+    default_model = 'gemini-1.5-flash'
+
+    @classmethod
+    def required_env(cls, endpoint=None):
+        return ['GOOGLE_API_KEY']
+
+    def get_endpoint(self):
+        return self.endpoint or os.getenv('GEMINI_API_ENDPOINT')
+
+    def prepare(self, declarations):
+        import google.generativeai as genai
+
+        endpoint = self.get_endpoint()
+        if endpoint:
+            genai.configure(api_key=os.getenv('GOOGLE_API_KEY'), transport='rest', client_options={"api_endpoint": endpoint})
+        else:
+            genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+        tools = [to_declaration(genai, declaration) for declaration in declarations]
+        self.client = genai.GenerativeModel(model_name=self.model, tools=tools)
+
+    def generate(self, prompt):
+        response = self.client.generate_content(prompt)
+        logger.debug(response)
+
+        usage = {}
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata:
+            usage = {
+                "prompt_tokens": metadata.prompt_token_count,
+                "response_tokens": metadata.candidates_token_count,
+                "total_tokens": metadata.total_token_count,
+            }
+        return [to_plan_step(part.function_call) for part in response.parts if part.function_call], usage
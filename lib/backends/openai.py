@@ -0,0 +1,61 @@
+import os
+import json
+import logging
+import urllib.request
+from . import Backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENDPOINT = 'https://api.openai.com/v1'
+REQUEST_TIMEOUT = 300
+
+"""
+Any server implementing the OpenAI chat completions API with tool calls, such as OpenAI itself or a
+local server (llama.cpp, vLLM, Ollama). The endpoint, or OPENAI_BASE_URL, is the base URL of the API;
+OPENAI_API_KEY is only required for the default endpoint. Uses only the standard library.
+"""
+class OpenAIBackend(Backend):
+    name = 'openai'
+    default_model = 'gpt-4o-mini'
+
+    @classmethod
+    def required_env(cls, endpoint=None):
+        return [] if endpoint or os.getenv('OPENAI_BASE_URL') else ['OPENAI_API_KEY']
+
+    def get_endpoint(self):
+        return self.endpoint or os.getenv('OPENAI_BASE_URL') or DEFAULT_ENDPOINT
+
+    def prepare(self, declarations):
+        self.url = f"{self.get_endpoint().rstrip('/')}/chat/completions"
+        self.tools = [{"type": "function", "function": declaration} for declaration in declarations]
+        self.headers = {"Content-Type": "application/json"}
+        if os.getenv('OPENAI_API_KEY'):
+            self.headers["Authorization"] = f"Bearer {os.getenv('OPENAI_API_KEY')}"
+
+    def generate(self, prompt):
+        body = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "tools": self.tools,
+            "tool_choice": "auto",
+        }
+        request = urllib.request.Request(self.url, data=json.dumps(body).encode('utf-8'), headers=self.headers)
+        # HTTP errors carry the status in `code`, so rate limits are retried like Gemini's.
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            data = json.load(response)
+        logger.debug(data)
+
+        message = data["choices"][0]["message"]
+        plan = []
+        for call in message.get("tool_calls") or []:
+            function = call["function"]
+            plan.append({"name": function["name"], "args": json.loads(function.get("arguments") or "{}")})
+
+        usage = {}
+        if data.get("usage"):
+            usage = {
+                "prompt_tokens": data["usage"].get("prompt_tokens"),
+                "response_tokens": data["usage"].get("completion_tokens"),
+                "total_tokens": data["usage"].get("total_tokens"),
+            }
+        return plan, usage
@@ -0,0 +1,104 @@
+import os
+import glob
+import logging
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .generate import run
+from .api_builder import DEPENDENCIES
+from .cache import DEFAULT_CACHE_DIR
+from .skeleton import ensure_skeleton
+
+logger = logging.getLogger(__name__)
+
+"""
+Expands the job arguments into (name, context directory, output directory) tuples.
+Each argument is a context directory or glob, optionally followed by `=` and an explicit output
+directory. Without one, jobs are generated into a directory named after the context under `output_root`.
+"""
+def expand_jobs(patterns, output_root='.'):
+    jobs = []
+    names = set()
+    seen = set()
+    for pattern in patterns:
+        pattern, _, output = pattern.partition('=')
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for context in matches:
+            if not os.path.isdir(context):
+                if not glob.has_magic(pattern):
+                    logger.warning(f"Skipping {context}: not a directory.")
+                continue
+            base = os.path.basename(os.path.normpath(os.path.abspath(context)))
+            key = (os.path.abspath(context), os.path.abspath(output or os.path.join(output_root, base)))
+            if key in seen:
+                continue
+            seen.add(key)
+
+            name = base
+            count = 2
+            while name in names:
+                name = f"{base}_{count}"
+                count += 1
+            names.add(name)
+            jobs.append((name, context, output or os.path.join(output_root, name)))
+    return jobs
+
+
+"""
+Runs one job in a worker process. Failures are returned rather than raised so that one broken context
+does not stop the rest of the batch.
+"""
+def run_job(name, context, output_dir, options):
+    start = perf_counter()
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        run(context, output_dir=output_dir, **options)
+        return name, None, perf_counter() - start
+    except Exception as e:
+        logger.exception(f"Job {name} failed.")
+        return name, f"{type(e).__name__}: {e}", perf_counter() - start
+
+
+"""
+Logs a summary table of the jobs, in the order they were given.
+"""
+def log_summary(jobs, results, total):
+    width = max([len(name) for name, _, _ in jobs] + [3])
+    logger.info("Batch summary:")
+    logger.info(f"  {'job':<{width}}  {'status':<6}  {'seconds':>8}  output")
+    for name, _, output_dir in jobs:
+        error, duration = results[name]
+        status = 'failed' if error else 'ok'
+        logger.info(f"  {name:<{width}}  {status:<6}  {duration:8.2f}  {output_dir}")
+        if error:
+            logger.info(f"  {'':<{width}}  {error}")
+    failures = sum(1 for error, _ in results.values() if error)
+    logger.info(f"{len(jobs) - failures} of {len(jobs)} jobs succeeded in {total:.2f}s.")
+
+
+"""
+Generates an API for every job on a process pool, one process per job at a time. Worker processes keep
+generations isolated from each other while sharing the plan and dependency caches on disk.
+`options` are passed to `run` for every job. Returns the number of failed jobs.
+"""
+def run_batch(jobs, options, processes=None):
+    processes = processes or os.cpu_count()
+    logger.info(f"Running {len(jobs)} jobs on {processes} processes.")
+    start = perf_counter()
+
+    # Build the shared dependency skeleton once, instead of in every job that finds the cache cold.
+    if not options.get('offline'):
+        try:
+            ensure_skeleton(DEPENDENCIES, options.get('cache_dir', DEFAULT_CACHE_DIR))
+        except Exception as e:
+            logger.warning(f"Unable to prepare the dependency skeleton, jobs will retry: {e}")
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_job, name, context, output_dir, options) for name, context, output_dir in jobs]
+        for future in as_completed(futures):
+            name, error, duration = future.result()
+            results[name] = (error, duration)
+            logger.info(f"Job {name} {'failed' if error else 'finished'} in {duration:.2f}s.")
+
+    log_summary(jobs, results, perf_counter() - start)
+    return sum(1 for error, _ in results.values() if error)
@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'nowde')
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+"""
+Returns a content hash of everything that influences the plan returned by the model.
+If none of these change, the model does not need to be asked again.
+"""
+def get_cache_key(prompt_template, context, declarations, model_name):
+    digest = hashlib.sha256()
+    for part in (prompt_template, context, declarations, model_name):
+        encoded = json.dumps(part, sort_keys=True, default=str).encode('utf-8')
+        # Length prefix each part so that moving bytes between parts changes the key.
+        digest.update(len(encoded).to_bytes(8, 'big'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+"""
+Reads a serialized plan (a list of function calls) from disk.
+"""
+def load_plan(path):
+    with open(path, 'r') as f:
+        plan = json.load(f)
+    if not isinstance(plan, list):
+        raise ValueError(f"Plan file {path} does not contain a list of function calls.")
+    return plan
+
+
+"""
+Writes a plan to disk, replacing the target atomically so readers never see a partial file.
+"""
+def save_plan(path, plan):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(plan, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+"""
+On-disk cache of plans returned by the model, keyed by `get_cache_key`.
+Entries are evicted least recently used first once the cache grows past `max_bytes`.
+"""
+class PlanCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.plan_dir = os.path.join(cache_dir, 'plans')
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.plan_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.plan_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            plan = load_plan(path)
+        except FileNotFoundError:
+            self.misses += 1
+            logger.info(f"Plan cache miss: {key[:12]}")
+            return None
+        except (ValueError, OSError) as e:
+            self.misses += 1
+            logger.warning(f"Discarding unreadable cached plan {path}: {e}")
+            self._remove(path)
+            return None
+
+        # Bump the modification time so eviction treats this entry as recently used.
+        os.utime(path)
+        self.hits += 1
+        logger.info(f"Plan cache hit: {key[:12]} ({path})")
+        return plan
+
+    def put(self, key, plan):
+        path = self.path(key)
+        save_plan(path, plan)
+        logger.info(f"Plan cached at {path}")
+        self.evict()
+        return path
+
+    def entries(self):
+        entries = []
+        for entry in os.scandir(self.plan_dir):
+            if entry.is_file() and entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another process sharing the cache.
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            logger.info(f"Evicting cached plan {path}")
+            self._remove(path)
+            total -= size
+
+    def log_stats(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        logger.info(f"Plan cache stats: {self.hits} hits, {self.misses} misses, {len(entries)} entries, {total} bytes of {self.max_bytes}.")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
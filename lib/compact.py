@@ -0,0 +1,183 @@
+import re
+import json
+import hashlib
+import logging
+from collections import Counter
+from .openapi import parse_document
+
+logger = logging.getLogger(__name__)
+
+# Keys that document an API but are not needed to generate its routes.
+DROPPED_KEYS = {'example', 'examples', 'x-example', 'x-examples', 'externalDocs', 'x-codeSamples', 'x-code-samples'}
+# Text keys shortened to their first sentence when longer than MAX_TEXT_CHARS.
+TEXT_KEYS = {'description', 'summary'}
+MAX_TEXT_CHARS = 160
+# Schema keys kept when a response schema is reduced to its shape.
+SHAPE_KEYS = {'type', '$ref', 'properties', 'items', 'allOf', 'oneOf', 'anyOf', 'additionalProperties'}
+MAX_SHAPE_DEPTH = 3
+# Repeated objects at least this large are moved to `$shared` and referenced, smaller ones stay inline.
+MIN_SHARED_BYTES = 128
+SHARED_KEY = '$shared'
+# Rough characters per token of the tokenizers in use, good enough to compare prompt sizes.
+CHARS_PER_TOKEN = 4
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+BLANK_LINES = re.compile(r'\n\s*\n(\s*\n)+')
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def to_json(document):
+    return json.dumps(document, separators=(',', ':'), sort_keys=True, ensure_ascii=False, default=str)
+
+
+def shorten(text):
+    text = ' '.join(text.split())
+    if len(text) <= MAX_TEXT_CHARS:
+        return text
+    sentence = SENTENCE_END.split(text, 1)[0]
+    return sentence if len(sentence) <= MAX_TEXT_CHARS else sentence[:MAX_TEXT_CHARS - 3].rstrip() + '...'
+
+
+"""
+Reduces a schema to its shape: types, properties and references, without formats, enums, patterns or
+descriptions, and without nesting deeper than MAX_SHAPE_DEPTH.
+"""
+def to_shape(schema, depth=MAX_SHAPE_DEPTH):
+    if isinstance(schema, list):
+        return [to_shape(item, depth) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    if depth <= 0:
+        return {key: schema[key] for key in ('type', '$ref') if key in schema} or {}
+
+    shape = {}
+    for key, value in schema.items():
+        if key not in SHAPE_KEYS:
+            continue
+        if key == 'properties' and isinstance(value, dict):
+            shape[key] = {name: to_shape(prop, depth - 1) for name, prop in value.items()}
+        elif key in ('type', '$ref'):
+            shape[key] = value
+        else:
+            shape[key] = to_shape(value, depth - 1)
+    return shape
+
+
+"""
+Removes examples and external docs, shortens long descriptions and reduces the schemas of responses
+to their shape. Request parameters and bodies are kept whole since they become routes and arguments.
+"""
+def strip_document(node, in_responses=False):
+    if isinstance(node, list):
+        return [strip_document(item, in_responses) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    stripped = {}
+    for key, value in node.items():
+        if key in DROPPED_KEYS:
+            continue
+        if key in TEXT_KEYS and isinstance(value, str):
+            stripped[key] = shorten(value)
+        elif key == 'schema' and in_responses:
+            stripped[key] = to_shape(value)
+        else:
+            stripped[key] = strip_document(value, in_responses or key == 'responses')
+    return stripped
+
+
+"""
+Moves objects that are repeated in the document, such as schemas inlined by every operation, into
+a top level `$shared` map and replaces every occurrence with a `$ref` to it. Objects nested in a
+repeated object only count once, so they stay inline in its shared copy.
+"""
+def dedupe_document(document):
+    if not isinstance(document, dict) or SHARED_KEY in document:
+        return document
+
+    digests = {}
+
+    def digest(node):
+        if isinstance(node, dict):
+            children = {name: digest(value) for name, value in node.items()}
+            encoded = 'd' + json.dumps(sorted((name, key) for name, (key, _) in children.items()))
+            size = sum(len(name) + child_size + 4 for name, (_, child_size) in children.items()) + 2
+        elif isinstance(node, list):
+            children = [digest(item) for item in node]
+            encoded = 'l' + json.dumps([key for key, _ in children])
+            size = sum(child_size + 1 for _, child_size in children) + 2
+        else:
+            encoded = json.dumps(node, default=str)
+            return 'v' + encoded, len(encoded)
+        key = hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+        if isinstance(node, dict):
+            digests[id(node)] = (key, size)
+        return key, size
+
+    digest(document)
+
+    counts = Counter()
+
+    def count(node):
+        if isinstance(node, dict):
+            if node is not document:
+                key = digests[id(node)][0]
+                counts[key] += 1
+                if counts[key] > 1:
+                    return
+            for value in node.values():
+                count(value)
+        elif isinstance(node, list):
+            for item in node:
+                count(item)
+
+    count(document)
+
+    shared = {}
+    names = {}
+
+    def rewrite(node, root=False):
+        if isinstance(node, dict):
+            key, size = digests[id(node)]
+            if not root and counts[key] > 1 and size >= MIN_SHARED_BYTES:
+                if key not in names:
+                    names[key] = f"s{len(names) + 1}"
+                    shared[names[key]] = rewrite(node, root=True)
+                return {"$ref": f"#/{SHARED_KEY}/{names[key]}"}
+            return {name: rewrite(value) for name, value in node.items()}
+        if isinstance(node, list):
+            return [rewrite(item) for item in node]
+        return node
+
+    rewritten = {name: rewrite(value) for name, value in document.items()}
+    if shared:
+        rewritten[SHARED_KEY] = shared
+    return rewritten
+
+
+"""
+Returns the entry in its compact form. JSON and YAML documents are stripped, deduplicated and written
+as canonical JSON; other text only loses trailing whitespace and runs of blank lines.
+"""
+def compact_entry(entry):
+    document = parse_document(entry["path"], entry["content"])
+    if isinstance(document, (dict, list)):
+        content = to_json(dedupe_document(strip_document(document)))
+    else:
+        content = BLANK_LINES.sub('\n\n', '\n'.join(line.rstrip() for line in entry["content"].splitlines())).strip()
+    return {**entry, "content": content}
+
+
+def compact_context(context):
+    return [compact_entry(entry) for entry in context]
+
+
+"""
+Formats context entries for the prompt, one file after another with its path, instead of the Python
+representation of the list which escapes every newline and quote.
+"""
+def format_context(context):
+    return "\n\n".join(f"File: {entry['path']}\n{entry['content']}" for entry in context)
@@ -0,0 +1,62 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = 'nowde.config.json'
+
+DEFAULT_CACHE = {
+    "enabled": False,
+    "maxEntries": 1000,
+    "ttl": 60,
+    "services": {},
+}
+
+class ConfigError(ValueError):
+    pass
+
+# Routers the generated API can use: express routers mounted one after another, or a single radix tree.
+ROUTERS = ('express', 'radix')
+
+"""
+Reads `nowde.config.json` from the context directory. The file configures the generated API rather
+than describing it, so it is never sent to the model. A missing file means the defaults.
+
+    {
+        "cache": {"enabled": true, "maxEntries": 1000, "ttl": 60, "services": {"getUser": 300, "listPosts": 0}},
+        "server": {"port": 8080, "host": "0.0.0.0", "cluster": true, "workers": 4},
+        "routes": {"wrap": true, "router": "radix"}
+    }
+"""
+def load_config(path):
+    config_path = os.path.join(path, CONFIG_FILE)
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    except ValueError as e:
+        raise ConfigError(f"Invalid {config_path}: {e}")
+    if not isinstance(config, dict):
+        raise ConfigError(f"Invalid {config_path}: expected an object.")
+
+    config["cache"] = {**DEFAULT_CACHE, **(config.get("cache") or {})}
+    config["server"] = config.get("server") or {}
+    config["routes"] = {"router": ROUTERS[0], **(config.get("routes") or {})}
+    if config["routes"]["router"] not in ROUTERS:
+        raise ConfigError(f"Invalid {config_path}: routes.router must be one of {', '.join(ROUTERS)}.")
+    if config["cache"]["enabled"]:
+        logger.info(f"Response cache enabled by {config_path}.")
+    return config
+
+
+"""
+Returns the number of seconds responses of a service are cached for, or 0 if they are not cached.
+Only GET services are cached. A service listed in `cache.services` uses its own TTL, others the default.
+"""
+def get_cache_ttl(config, service_name, method='GET'):
+    cache = (config or {}).get("cache") or DEFAULT_CACHE
+    if not cache.get("enabled") or method.upper() != 'GET':
+        return 0
+    return cache.get("services", {}).get(service_name, cache.get("ttl", 0))
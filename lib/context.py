@@ -0,0 +1,161 @@
+import os
+import mmap
+import fnmatch
+import logging
+from .config import CONFIG_FILE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_FILE_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_TOTAL_BYTES = 20 * 1024 * 1024
+MMAP_THRESHOLD = 1024 * 1024
+BINARY_SNIFF_BYTES = 8192
+IGNORE_FILES = ['.gitignore', '.nowdeignore']
+DEFAULT_IGNORE = ['.git/', 'node_modules/', '.nowde/', '__pycache__/', '.DS_Store', CONFIG_FILE]
+
+"""
+A small subset of gitignore rules: `#` comments, `!` negation, trailing `/` for directories only,
+and patterns containing a `/` other than a trailing one, such as `/docs`, are anchored to the context
+root while others match at any depth.
+"""
+class IgnoreRules:
+    def __init__(self, patterns=None):
+        self.rules = []
+        for pattern in patterns or []:
+            self.add(pattern)
+
+    def add(self, pattern):
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith('#'):
+            return
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        directory_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # As in gitignore, a slash other than a trailing one anchors the pattern to the root.
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        self.rules.append((pattern, negate, directory_only, anchored))
+
+    def load(self, path):
+        try:
+            with open(path, 'r', errors='replace') as f:
+                for line in f:
+                    self.add(line)
+        except FileNotFoundError:
+            pass
+
+    def ignored(self, rel_path, is_dir):
+        name = rel_path.rsplit('/', 1)[-1]
+        ignored = False
+        for pattern, negate, directory_only, anchored in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if fnmatch.fnmatchcase(rel_path if anchored else name, pattern):
+                ignored = not negate
+        return ignored
+
+
+"""
+Returns True if the sample looks like binary data rather than text.
+"""
+def is_binary(sample):
+    return b'\0' in sample
+
+
+"""
+Reads a text file. Large files are memory mapped and decoded straight from the mapping, so their bytes
+are never copied into a separate buffer first. Returns None for binary or undecodable files.
+"""
+def read_text(path, size):
+    with open(path, 'rb') as f:
+        try:
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if is_binary(mm[:BINARY_SNIFF_BYTES]):
+                        return None
+                    with memoryview(mm) as view:
+                        return str(view, 'utf-8')
+            data = f.read()
+            if is_binary(data[:BINARY_SNIFF_BYTES]):
+                return None
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+
+
+"""
+Yields the context files under the path one at a time, recursing into sub directories.
+Ignored paths, binary files and files over the per file budget are skipped, and loading stops once the
+total budget is used. `stats` is filled in with counts as files are visited.
+"""
+def iter_context(path, max_file_bytes=DEFAULT_MAX_FILE_BYTES, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES, stats=None):
+    stats = stats if stats is not None else {}
+    stats.update({"files": 0, "bytes": 0, "ignored": 0, "binary": 0, "too_large": 0, "over_budget": 0})
+
+    rules = IgnoreRules(DEFAULT_IGNORE)
+    for ignore_file in IGNORE_FILES:
+        rules.load(os.path.join(path, ignore_file))
+
+    for root, dirs, files in os.walk(path):
+        rel_root = os.path.relpath(root, path).replace(os.sep, '/')
+        rel_root = '' if rel_root == '.' else f"{rel_root}/"
+
+        # Prune ignored directories so their contents are never walked, and sort for a stable order.
+        kept = []
+        for d in sorted(dirs):
+            if rules.ignored(f"{rel_root}{d}", True):
+                stats["ignored"] += 1
+            else:
+                kept.append(d)
+        dirs[:] = kept
+
+        for file in sorted(files):
+            if file in IGNORE_FILES or rules.ignored(f"{rel_root}{file}", False):
+                stats["ignored"] += 1
+                continue
+
+            file_path = os.path.join(root, file)
+            try:
+                size = os.path.getsize(file_path)
+            except OSError as e:
+                logger.warning(f"Unable to read {file_path}: {e}")
+                continue
+
+            if size > max_file_bytes:
+                logger.warning(f"Skipping {file_path}: {size} bytes exceeds the per file limit of {max_file_bytes}.")
+                stats["too_large"] += 1
+                continue
+            if stats["bytes"] + size > max_total_bytes:
+                logger.warning(f"Skipping {file_path}: context limit of {max_total_bytes} bytes reached.")
+                stats["over_budget"] += 1
+                continue
+
+            content = read_text(file_path, size) if size else ""
+            if content is None:
+                logger.info(f"Skipping binary file: {file_path}")
+                stats["binary"] += 1
+                continue
+
+            stats["files"] += 1
+            stats["bytes"] += size
+            yield {
+                "path": file_path,
+                "content": content
+            }
+
+
+"""
+Returns the context of the directory. This is the content of the text files in the directory and
+its sub directories.
+"""
+def get_context(path, max_file_bytes=DEFAULT_MAX_FILE_BYTES, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES):
+    logger.info(f"Getting context from path: {path}")
+    stats = {}
+    content = list(iter_context(path, max_file_bytes, max_total_bytes, stats))
+    logger.info(
+        f"Context: {stats['files']} files, {stats['bytes']} bytes, ~{stats['bytes'] // 4} tokens "
+        f"(skipped {stats['ignored']} ignored, {stats['binary']} binary, {stats['too_large']} too large, {stats['over_budget']} over budget)."
+    )
+    return content
@@ -0,0 +1,107 @@
+import os
+import logging
+from .templates import render, identifier, string, shorthand_object, named_import, local_names
+
+logger = logging.getLogger(__name__)
+
+INVOKE_SERVICES_PATH = 'src/lib/invokeServices.js'
+RADIX_ROUTER_PATH = 'src/lib/router.js'
+
+"""
+Returns the import and the expression creating the router of a module in `path`, for the `express`
+or `radix` router. The import is aliased if its name is in `taken`, the names the module already binds.
+"""
+def get_router_source(router, path, taken=None):
+    taken = set() if taken is None else taken
+    if router == 'radix':
+        router_path = os.path.relpath(RADIX_ROUTER_PATH, path).replace(os.sep, '/')
+        local = local_names(['createRouter'], taken)
+        return named_import(local, router_path), f"{local['createRouter']}()"
+    local = local_names(['express'], taken)['express']
+    return f'import {local} from "express";', f'{local}.Router()'
+
+
+"""
+In memory model of a controller file. Routes are collected across the whole plan and the file is
+rendered once, with each service imported a single time.
+"""
+class Controller:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.services = {}
+        self.routes = {}
+
+    """
+    Adds a route. Returns False if the method and endpoint are already handled by this controller.
+    """
+    def add_route(self, method, endpoint, services):
+        key = (method.upper(), endpoint or '/')
+        if key in self.routes:
+            logger.warning(f"Route {key[0]} {key[1]} is already defined on controller {self.name}, ignoring.")
+            return False
+        self.routes[key] = list(services)
+        for service in services:
+            self.services.setdefault(service, None)
+        return True
+
+    def args(self):
+        return {
+            "controller_name": self.name,
+            "controller_path": self.path,
+            "routes": [{"method": method, "endpoint": endpoint, "services": services} for (method, endpoint), services in self.routes.items()],
+        }
+
+    """
+    Renders the controller file. Routes calling a single service listed in `streams` pipe its upstream
+    response through, and other routes calling a single service respond with its result as is, unless
+    `wrap` is set. The others respond with the results of their services keyed by name.
+    """
+    def render(self, streams=(), router='express', wrap=False):
+        helpers_path = os.path.relpath(INVOKE_SERVICES_PATH, self.path).replace(os.sep, '/')
+        kinds = {}
+        for key, services in self.routes.items():
+            if len(services) == 1 and services[0] in streams:
+                kinds[key] = 'stream_route'
+            elif len(services) == 1 and not wrap:
+                kinds[key] = 'result_route'
+            else:
+                kinds[key] = 'route'
+        streamed = {services[0] for key, services in self.routes.items() if kinds[key] == 'stream_route'}
+        buffered = {service for key, services in self.routes.items() if kinds[key] != 'stream_route' for service in services}
+
+        # Services keep their own names where possible, since routes key their results by them. Any
+        # other import clashing with a service is aliased.
+        taken = {'router'}
+        services = local_names([service for service in self.services if service in buffered], taken)
+        stream_services = {service: local_names([f"{service}Stream"], taken)[f"{service}Stream"] for service in self.services if service in streamed}
+        helpers = []
+        if 'route' in kinds.values():
+            helpers += ['invokeServices', 'sendResults']
+        if 'result_route' in kinds.values():
+            helpers.append('sendResult')
+        if streamed:
+            helpers.append('streamService')
+        helpers = local_names(helpers, taken)
+
+        router_import, router_expression = get_router_source(router, self.path, taken)
+        imports = [router_import, named_import(helpers, helpers_path)]
+        for service in self.services:
+            names = {service: services[service]} if service in buffered else {}
+            if service in streamed:
+                names[f"{service}Stream"] = stream_services[service]
+            imports.append(named_import(names, f'../services/{service}/index.js'))
+
+        routes = []
+        for (method, endpoint), route_services in self.routes.items():
+            values = {"method": identifier(method.lower()), "endpoint": string(endpoint)}
+            if kinds[(method, endpoint)] == 'stream_route':
+                route = render('stream_route', name=string(route_services[0]), service=stream_services[route_services[0]], stream_service=helpers['streamService'], **values)
+            elif kinds[(method, endpoint)] == 'result_route':
+                route = render('result_route', name=string(route_services[0]), service=services[route_services[0]], send_result=helpers['sendResult'], **values)
+            else:
+                properties = shorthand_object({service: services[service] for service in route_services}, '  const services = ;')
+                route = render('route', services=properties, invoke_services=helpers['invokeServices'], send_results=helpers['sendResults'], **values)
+            routes.append(route)
+
+        return render('router', imports=imports, router=router_expression, routes="\n".join(routes))
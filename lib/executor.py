@@ -0,0 +1,149 @@
+import logging
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .api_builder import finalize_project, write_controllers, write_service_helpers
+from .project import Project
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Stages of a plan and the stages each one must wait for.
+STAGES = {
+    'project': [],
+    'dependencies': ['project'],
+    'entrypoint': ['project'],
+    'services': ['project'],
+    'controllers': ['services'],
+    'indexes': ['controllers'],
+    'format': ['dependencies', 'entrypoint', 'services', 'controllers', 'indexes'],
+}
+
+# Called once with the project when a stage finishes, before any dependent stage starts.
+STAGE_HOOKS = {
+    'services': write_service_helpers,
+    'controllers': write_controllers,
+}
+
+STEP_STAGES = {
+    'create_project_folder': 'project',
+    'install_dependencies': 'dependencies',
+    'generate_entrypoint': 'entrypoint',
+    'generate_service': 'services',
+    'generate_controller': 'controllers',
+    'generate_services_index': 'indexes',
+    'generate_controller_index': 'indexes',
+    'format_files': 'format',
+}
+
+"""
+Groups the steps of a plan into tasks per stage. Each task is a list of steps run in order; steps in
+different tasks of a stage may run concurrently. Routes of the same controller share a task since
+they build up the same file.
+"""
+def build_tasks(plan):
+    tasks = {stage: [] for stage in STAGES}
+    controllers = {}
+    for step in plan:
+        stage = STEP_STAGES.get(step["name"])
+        if stage is None:
+            logger.error(f"Function {step['name']} not found.")
+            continue
+        if step["name"] == 'generate_controller':
+            args = step.get("args") or {}
+            key = (args.get('controller_path', 'src/controllers'), args.get('controller_name'))
+            if key not in controllers:
+                controllers[key] = []
+                tasks[stage].append(controllers[key])
+            controllers[key].append(step)
+        else:
+            tasks[stage].append([step])
+    return tasks
+
+
+"""
+Logs the wall clock time of each stage. Stages may overlap, so they do not add up to the total.
+"""
+def log_timings(timings, total):
+    logger.info("Stage timings:")
+    for stage, (start, end, count) in timings.items():
+        logger.info(f"  {stage:<13} {end - start:8.3f}s  ({count} tasks)")
+    logger.info(f"  {'total':<13} {total:8.3f}s")
+
+
+"""
+Executes a plan as a graph of stages. The project folder is created first, then every stage starts as
+soon as the stages it depends on finish, running its tasks on a thread pool.
+`execute` is called with the step name, its args, the project, the output directory and `options`.
+"""
+def execute_plan(plan, execute, output_dir='.', workers=None, options=None):
+    logger.info(f"Executing plan with {len(plan)} steps.")
+    tasks = build_tasks(plan)
+    timings = {}
+    plan_start = perf_counter()
+
+    project = None
+    stage_start = perf_counter()
+    for task in tasks['project']:
+        for step in task:
+            if project is not None:
+                logger.warning("Project folder already created, ignoring additional create_project_folder call.")
+                continue
+            with span(step["name"], 'execute'):
+                project = execute(step["name"], step.get("args") or {}, None, output_dir, options)
+    if project is None:
+        project = Project(output_dir, options)
+    timings['project'] = (stage_start, perf_counter(), len(tasks['project']))
+
+    def run_task(task):
+        for step in task:
+            with span(step["name"], 'execute'):
+                execute(step["name"], step.get("args") or {}, project, output_dir, options)
+
+    def finish_stage(stage):
+        if stage in STAGE_HOOKS:
+            with span(STAGE_HOOKS[stage].__name__, 'execute'):
+                STAGE_HOOKS[stage](project)
+        done.add(stage)
+        start, _, count = timings[stage]
+        timings[stage] = (start, perf_counter(), count)
+
+    done = {'project'}
+    started = {'project'}
+    remaining = {stage: len(stage_tasks) for stage, stage_tasks in tasks.items()}
+    pending = {}
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while len(done) < len(STAGES):
+            progressed = True
+            while progressed:
+                progressed = False
+                for stage, dependencies in STAGES.items():
+                    if stage in started or not all(d in done for d in dependencies):
+                        continue
+                    started.add(stage)
+                    progressed = True
+                    timings[stage] = (perf_counter(), None, remaining[stage])
+                    if remaining[stage] == 0:
+                        finish_stage(stage)
+                        del timings[stage]
+                        continue
+                    for task in tasks[stage]:
+                        pending[pool.submit(run_task, task)] = stage
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = pending.pop(future)
+                future.result()
+                remaining[stage] -= 1
+                if remaining[stage] == 0:
+                    finish_stage(stage)
+    except BaseException:
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    with span('finalize_project', 'execute'):
+        finalize_project(project)
+    log_timings(timings, perf_counter() - plan_start)
+    return project
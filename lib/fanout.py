@@ -0,0 +1,155 @@
+import json
+import random
+import asyncio
+import logging
+from .openapi import parse_document, PATH_PARAM, HTTP_METHODS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_CHUNK_BYTES = 200 * 1024
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+# Rate limits and transient server errors, as reported in the `code` of google.api_core exceptions.
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+# Top level spec keys that are not needed to enumerate endpoints and are not repeated in every chunk.
+SHARED_SPEC_EXCLUDES = ['paths', 'components', 'definitions']
+
+"""
+Returns the group a path belongs to: the first tag of its operations, or else its first static segment.
+"""
+def get_path_group(path, item):
+    if isinstance(item, dict):
+        for method in HTTP_METHODS:
+            operation = item.get(method)
+            if isinstance(operation, dict) and operation.get('tags'):
+                return str(operation['tags'][0])
+    for segment in path.split('/'):
+        if segment and not PATH_PARAM.fullmatch(segment):
+            return segment
+    return 'root'
+
+
+"""
+Splits the paths of a document into groups whose document fits the chunk size. Paths are grouped by
+tag or first static segment, groups that are still too large by ever longer path prefixes, and finally
+into single paths. Small groups are packed back together by `chunk_context`.
+"""
+def split_paths(paths, shared, max_chunk_bytes, name='', depth=0):
+    content = json.dumps({**shared, "paths": paths}, separators=(',', ':'), default=str)
+    if len(content) <= max_chunk_bytes or len(paths) == 1:
+        return [(name, content)]
+
+    longest = max(len([s for s in path.split('/') if s]) for path in paths)
+    while True:
+        groups = {}
+        for path, item in paths.items():
+            if depth == 0:
+                key = get_path_group(path, item)
+            elif depth <= longest:
+                key = '/'.join([s for s in path.split('/') if s][:depth])
+            else:
+                key = path
+            groups.setdefault(key, {})[path] = item
+        depth += 1
+        # Grouping by a prefix all the paths share does not split anything, go one segment deeper.
+        if len(groups) > 1:
+            break
+
+    pieces = []
+    for key, group in groups.items():
+        pieces.extend(split_paths(group, shared, max_chunk_bytes, f"{name}#{key}", depth))
+    return pieces
+
+
+"""
+Splits a context entry that is larger than the chunk size. Documents with `paths` are split by tag,
+path prefix and path into smaller documents, anything else is split on line boundaries.
+"""
+def split_entry(entry, max_chunk_bytes):
+    content = entry["content"]
+    if len(content) <= max_chunk_bytes:
+        return [entry]
+
+    document = parse_document(entry["path"], content)
+    if isinstance(document, dict) and isinstance(document.get('paths'), dict) and document['paths']:
+        shared = {key: value for key, value in document.items() if key not in SHARED_SPEC_EXCLUDES}
+        pieces = split_paths(document['paths'], shared, max_chunk_bytes)
+        logger.info(f"Split {entry['path']} into {len(pieces)} pieces by tag, path prefix and path.")
+        return [{"path": f"{entry['path']}{name}", "content": piece} for name, piece in pieces]
+
+    pieces = []
+    lines = []
+    size = 0
+    for line in content.splitlines(keepends=True):
+        if lines and size + len(line) > max_chunk_bytes:
+            pieces.append("".join(lines))
+            lines = []
+            size = 0
+        lines.append(line)
+        size += len(line)
+    if lines:
+        pieces.append("".join(lines))
+    return [{"path": f"{entry['path']}#{index}", "content": piece} for index, piece in enumerate(pieces)]
+
+
+"""
+Splits the context into independent chunks of at most `max_chunk_bytes`, packing small files together.
+"""
+def chunk_context(context, max_chunk_bytes=DEFAULT_MAX_CHUNK_BYTES):
+    chunks = []
+    current = []
+    size = 0
+    for entry in context:
+        for piece in split_entry(entry, max_chunk_bytes):
+            piece_size = len(piece["content"])
+            if current and size + piece_size > max_chunk_bytes:
+                chunks.append(current)
+                current = []
+                size = 0
+            current.append(piece)
+            size += piece_size
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+
+"""
+Returns True if the request failed because of a rate limit or a transient server error.
+"""
+def is_retryable(error):
+    return getattr(error, 'code', None) in RETRYABLE_CODES
+
+
+"""
+Sends one chunk, retrying rate limited requests with exponential backoff and jitter.
+The semaphore is released while backing off so other chunks can use the slot.
+"""
+async def send_with_retry(send, chunk, semaphore, retries, backoff):
+    for attempt in range(retries + 1):
+        async with semaphore:
+            try:
+                # The Gemini SDK's async client does not support the REST transport, so the blocking
+                # call runs in a worker thread instead.
+                return await asyncio.to_thread(send, chunk)
+            except Exception as e:
+                if attempt == retries or not is_retryable(e):
+                    raise
+                error = e
+        delay = backoff * (2 ** attempt) * (0.5 + random.random())
+        logger.warning(f"Request failed ({error}), retrying in {delay:.1f}s ({attempt + 1}/{retries}).")
+        await asyncio.sleep(delay)
+
+
+async def fan_out(chunks, send, concurrency, retries, backoff):
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(send_with_retry(send, chunk, semaphore, retries, backoff) for chunk in chunks))
+
+
+"""
+Sends every chunk with at most `concurrency` requests in flight and returns their plans in order.
+`send` is called with a chunk and returns the plan for it.
+"""
+def generate_plans(chunks, send, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    logger.info(f"Sending {len(chunks)} chunks with up to {concurrency} concurrent requests.")
+    return asyncio.run(fan_out(chunks, send, concurrency, retries, backoff))
@@ -1,164 +1,187 @@
 import os
 import logging
-import google.generativeai as genai
+from .context import get_context, DEFAULT_MAX_FILE_BYTES, DEFAULT_MAX_TOTAL_BYTES
+from .openapi import split_specs, compile_spec
+from .plan import check_routes, merge_plans
+from .fanout import chunk_context, generate_plans, DEFAULT_CONCURRENCY, DEFAULT_MAX_CHUNK_BYTES
+from .cache import PlanCache, get_cache_key, load_plan, save_plan, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
 from .api_builder import install_dependencies, format_files, generate_entrypoint, generate_controller_index, generate_controller, generate_services_index, generate_service, create_project_folder
+from .executor import execute_plan
+from .tracing import span
+from .compact import compact_context, format_context, estimate_tokens
+from .config import load_config
+from .backends import get_backend, DEFAULT_BACKEND
 
 logger = logging.getLogger(__name__)
 
-"""
-Returns the context of the directory. This is the content of the files in the directory.
-Does not support nested directories.
-"""
-def get_context(path):
-    logger.info(f"Getting context from path: {path}")
-    context = []
-    for root, dirs, files in os.walk(path):
-        for file in files:
-            context.append(os.path.join(root, file))
-    content = []
-    for c in context:
-        with open(c, 'r') as f:
-            data = {
-                    "path": c,
-                    "content": f.read()
-                    }
-            content.append(data)
-    logger.info(f"Context: {content}")
-    return content
+PROMPT_TEMPLATE = """
+        Your job is to build APIs based on the context found in this directory.
+        Build the API by generating the necessary files and code.
+
+        Then, generate the necessary files and code to build the API by running the
+        available functions.
 
+        Use the following context to generate the API:
+            {context}
+
+        Order of Tasks:
+            - Create the project folder first.
+            - Install the necessary dependencies.
+            - Create the entrypoint file before generating controllers.
+            - Generate the service index. Only ever call this once.
+            - Generate the controller index. Only ever call this once.
+            - Generate a service for each endpoint found. This may include all endpoints in open api specs, json files, or other files.
+            - Generate a route/controller for each service function found.
+            - Always group similar routes together in the same controller by using the same controller name to construct the controller.
+            - Always format the code using prettier when all tasks are complete.
+
+        """
 
 """
-Returns the declarations for the functions that can be called to generate the API.
+Returns the declarations for the functions that can be called to generate the API, as JSON schema.
 """
 def get_declarations():
     logger.info("Getting declarations.")
-    generate_entrypoint = genai.protos.FunctionDeclaration(
-        name='generate_entrypoint',
-        description="Generates a node index file which starts a simple express server.",
-    )
-    generate_controller_index = genai.protos.FunctionDeclaration(
-        name='generate_controller_index',
-        description="Generates a controller index file which exports all the controllers. Only ever call this once.",
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'controller_names':genai.protos.Schema(
-                    type=genai.protos.Type.ARRAY,
-                    items=genai.protos.Schema(type=genai.protos.Type.STRING),
-                    description="List of controller names to export. Always name this based on the entity being resolved. Always use camel case."
-                )
+    generate_entrypoint = {
+        "name": 'generate_entrypoint',
+        "description": "Generates a node index file which starts a simple express server.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                'port': {
+                    "type": "integer",
+                    "description": "Port the server listens on. Default is 3000."
+                },
+                'host': {
+                    "type": "string",
+                    "description": "Host the server binds to. Default is all interfaces."
+                }
+            }
+        }
+    }
+    generate_controller_index = {
+        "name": 'generate_controller_index',
+        "description": "Generates a controller index file which exports all the controllers. Only ever call this once.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                'controller_names': {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "List of controller names to export. Always name this based on the entity being resolved. Always use camel case."
+                }
             },
-            required=['controller_names']
-        )
-    )
-    generate_controller = genai.protos.FunctionDeclaration(
-        name='generate_controller',
-        description="Generates a node controller file. Can be called multiple times to create multiple controllers. Append multiple routes to the same controller by calling this function with the same controller name repetitivly.",
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'controller_name':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="Name of the controller. Do not use the word 'controller' in the name. Should always be camel case. Should match the property `controller_names` in the `generate_controller_index` function."
-                ),
-                'services':genai.protos.Schema(
-                    type=genai.protos.Type.ARRAY,
-                    items=genai.protos.Schema(type=genai.protos.Type.STRING),
-                    description="List of services to import and call. Array of strings matching with the name of the service."
-                ),
-                'controller_path':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="Path to the controllers directory. Default is 'src/controllers'."
-                ),
-                'method':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="HTTP method of the controller. Default is GET."
-                ),
-                "endpoint":genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="URL endpoint for the controller. Use NodeJS Express syntax for URL parameters - which is a slash and a colon to define url params. Use camel case for each param. Example: '/:id'. Example 2: '/:id/:name'. Example 3: '/:id/:name/:firstName'. Only include url params in this endpoint, as the parent controller path is already defined. Default is '/'. Should never include the name of the entity being resolved."
-                ),
+            "required": ['controller_names']
+        }
+    }
+    generate_controller = {
+        "name": 'generate_controller',
+        "description": "Generates a node controller file. Can be called multiple times to create multiple controllers. Append multiple routes to the same controller by calling this function with the same controller name repetitivly.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                'controller_name': {
+                    "type": "string",
+                    "description": "Name of the controller. Do not use the word 'controller' in the name. Should always be camel case. Should match the property `controller_names` in the `generate_controller_index` function."
+                },
+                'services': {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "List of services to import and call. Array of strings matching with the name of the service."
+                },
+                'controller_path': {
+                    "type": "string",
+                    "description": "Path to the controllers directory. Default is 'src/controllers'."
+                },
+                'method': {
+                    "type": "string",
+                    "description": "HTTP method of the controller. Default is GET."
+                },
+                "endpoint": {
+                    "type": "string",
+                    "description": "URL endpoint for the controller. Use NodeJS Express syntax for URL parameters - which is a slash and a colon to define url params. Use camel case for each param. Example: '/:id'. Example 2: '/:id/:name'. Example 3: '/:id/:name/:firstName'. Only include url params in this endpoint, as the parent controller path is already defined. Default is '/'. Should never include the name of the entity being resolved."
+                },
             },
-            required=['controller_name']
-        )
-    )
-    format_files = genai.protos.FunctionDeclaration(
-        name='format_files',
-        description="Formats the node_api directory using prettier."
-    )
-    install_dependencies = genai.protos.FunctionDeclaration(
-        name='install_dependencies',
-        description="Installs the necessary dependencies for the node_api directory.",
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'project_name':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="Name of the project folder."
-                )
+            "required": ['controller_name']
+        }
+    }
+    format_files = {
+        "name": 'format_files',
+        "description": "Formats the node_api directory using prettier."
+    }
+    install_dependencies = {
+        "name": 'install_dependencies',
+        "description": "Installs the necessary dependencies for the node_api directory.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                'project_name': {
+                    "type": "string",
+                    "description": "Name of the project folder."
+                }
             },
-            required=['project_name']
-        )
-    )
-    generate_services_index = genai.protos.FunctionDeclaration(
-        name='generate_services_index',
-        description="Generates a services index file which exports all the services. Only needs to be called once.",
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'service_names':genai.protos.Schema(
-                    type=genai.protos.Type.ARRAY,
-                    items=genai.protos.Schema(type=genai.protos.Type.STRING),
-                    description="List of service names to export. Should be camel case."
-                ),
-                'service_path':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="Path to the services directory."
-                )
+            "required": ['project_name']
+        }
+    }
+    generate_services_index = {
+        "name": 'generate_services_index',
+        "description": "Generates a services index file which exports all the services. Only needs to be called once.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                'service_names': {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "List of service names to export. Should be camel case."
+                },
+                'service_path': {
+                    "type": "string",
+                    "description": "Path to the services directory."
+                }
             },
-            required=['service_names']
-        )
-    )
-    generate_service = genai.protos.FunctionDeclaration(
-        name='generate_service',
-        description="Generates a node service file. Can be called multiple times to create multiple services.",
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'service_name':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="Name of the service. Should be camel case."
-                ),
-                'uri':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="URI of the service. If the URI/URL has parameters, use the following format to represent the parameter in javascript as a formatted string literal accessing the `params` variable. Ex: `${params.id}`. Example 2: `${params.firstName}`."
-                ),
-                'service_path':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="Path to the services directory. Default is 'src/services'."
-                ),
-                'method':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="HTTP method of the service. Default is GET."
-                )
+            "required": ['service_names']
+        }
+    }
+    generate_service = {
+        "name": 'generate_service',
+        "description": "Generates a node service file. Can be called multiple times to create multiple services.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                'service_name': {
+                    "type": "string",
+                    "description": "Name of the service. Should be camel case."
+                },
+                'uri': {
+                    "type": "string",
+                    "description": "URI of the service. If the URI/URL has parameters, use the following format to represent the parameter in javascript as a formatted string literal accessing the `params` variable. Ex: `${params.id}`. Example 2: `${params.firstName}`."
+                },
+                'service_path': {
+                    "type": "string",
+                    "description": "Path to the services directory. Default is 'src/services'."
+                },
+                'method': {
+                    "type": "string",
+                    "description": "HTTP method of the service. Default is GET."
+                }
             },
-            required=['service_name', 'uri']
-        )
-    )
-    create_project_folder = genai.protos.FunctionDeclaration(
-        name='create_project_folder',
-        description="Creates a project folder for the API.",
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'project_name':genai.protos.Schema(
-                    type=genai.protos.Type.STRING,
-                    description="Path to create the project folder."
-                )
+            "required": ['service_name', 'uri']
+        }
+    }
+    create_project_folder = {
+        "name": 'create_project_folder',
+        "description": "Creates a project folder for the API.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                'project_name': {
+                    "type": "string",
+                    "description": "Path to create the project folder."
+                }
             },
-            required=['project_name']
-        )
-    )
+            "required": ['project_name']
+        }
+    }
 
     return [generate_entrypoint, generate_controller_index, generate_controller, format_files, install_dependencies, generate_services_index, generate_service, create_project_folder]
 
@@ -166,85 +189,147 @@ def get_declarations():
 """
 Executes the function based on the function name returned from the model.
 Arguments are passed to the function to generate the API - but they may not exist as some args are optional.
+Every function writes into `project`, except `create_project_folder` which creates the project under
+`output_dir` with the run `options` and returns it.
 """
-def execute_function(fn, args):
-    if fn.name == 'generate_entrypoint':
-        port = args.get('port', 3000)
+def execute_function(name, args, project=None, output_dir='.', options=None):
+    if name == 'generate_entrypoint':
+        # Server settings from the command line or config file override the ones in the plan.
+        server = project.options.get('server', {})
+        port = server.get('port') or args.get('port', 3000)
+        host = server.get('host') or args.get('host')
         controller_path = args.get('controller_path', 'controllers')
-        generate_entrypoint(port, controller_path)
-    elif fn.name == 'generate_controller_index':
+        generate_entrypoint(project, port, controller_path, host, server.get('cluster', False), server.get('workers'))
+    elif name == 'generate_controller_index':
         controller_path = args.get('controller_path', 'src/controllers')
         controller_names = args.get('controller_names', [])
-        generate_controller_index(controller_names, controller_path)
-    elif fn.name == 'generate_controller':
+        mounts = args.get('mounts')
+        generate_controller_index(project, controller_names, controller_path, mounts)
+    elif name == 'generate_controller':
         controller_path = args.get('controller_path', 'src/controllers')
         services = args.get('services', [])
         method = args.get('method', 'GET')
         controller_name = args.get('controller_name')
         endpoint = args.get('endpoint', None)
-        generate_controller(controller_name, services, controller_path, method, endpoint)
-    elif fn.name == 'install_dependencies':
+        generate_controller(project, controller_name, services, controller_path, method, endpoint)
+    elif name == 'install_dependencies':
         project_name = args.get('project_name', 'node_api')
-        install_dependencies(project_name)
-    elif fn.name == 'format_files':
-        format_files()
-    elif fn.name == 'generate_services_index':
+        install_dependencies(project, project_name)
+    elif name == 'format_files':
+        format_files(project)
+    elif name == 'generate_services_index':
         service_names = args.get('service_names', [])
         service_path = args.get('service_path', 'src/services')
-        generate_services_index(service_names, service_path)
-    elif fn.name == 'generate_service':
+        generate_services_index(project, service_names, service_path)
+    elif name == 'generate_service':
         service_name = args.get('service_name')
         uri = args.get('uri')
         service_path = args.get('service_path', 'src/services')
         method = args.get('method', 'GET')
-        generate_service(service_name, uri, service_path, method)
-    elif fn.name == 'create_project_folder':
-        project_name = args.get('project_name')
-        create_project_folder(project_name)
+        generate_service(project, service_name, uri, service_path, method)
+    elif name == 'create_project_folder':
+        project_name = args.get('project_name', 'node_api')
+        return create_project_folder(project_name, output_dir, options)
     else:
-        logger.error(f"Function {fn.name} not found.")
+        logger.error(f"Function {name} not found.")
 
 """
-Runs the application. This is the main function that is called to generate the API.
+Asks the model for the plan of function calls that builds the API.
 """
-def run(path):
-    logger.info("Starting the application.")
-    google_api_key = os.getenv('GOOGLE_API_KEY')
+def request_plan(backend, prompt):
+    with span('model_request', 'model', backend=backend.name, prompt_bytes=len(prompt)) as trace:
+        plan, usage = backend.generate(prompt)
+        trace.update({key: value for key, value in usage.items() if value is not None})
+        trace['steps'] = len(plan)
+
+    tokens = f", {trace['total_tokens']} tokens" if 'total_tokens' in trace else ''
+    logger.info(f"Model responded with {len(plan)} function calls{tokens}.")
+    return plan
+
 
+"""
+Returns the plan the model generates for the given context. The context is split into chunks which are
+served from the plan cache when the prompt, chunk, declarations and model are unchanged; the remaining
+chunks are sent concurrently and their plans merged. With `compact`, structured context files are
+stripped down to what route generation needs before chunking.
+"""
+def get_model_plan(context, backend, use_cache=True, cache_dir=DEFAULT_CACHE_DIR, cache_max_bytes=DEFAULT_MAX_BYTES, concurrency=DEFAULT_CONCURRENCY, max_chunk_bytes=DEFAULT_MAX_CHUNK_BYTES, compact=True):
     declarations = get_declarations()
-    context = get_context(path)
+    if compact:
+        with span('compact_context', 'context') as trace:
+            before = estimate_tokens(format_context(context))
+            context = compact_context(context)
+            after = estimate_tokens(format_context(context))
+            trace.update(tokens_before=before, tokens_after=after)
+        logger.info(f"Compacted context from ~{before} to ~{after} tokens.")
+    chunks = chunk_context(context, max_chunk_bytes)
 
-    genai.configure(api_key=google_api_key)
-    model = genai.GenerativeModel(model_name="gemini-1.5-flash", tools=declarations)
+    cache = None
+    keys = []
+    plans = [None] * len(chunks)
+    if use_cache:
+        cache = PlanCache(cache_dir, cache_max_bytes)
+        for index, chunk in enumerate(chunks):
+            keys.append(get_cache_key(PROMPT_TEMPLATE, format_context(chunk), declarations, backend.cache_id()))
+            plans[index] = cache.get(keys[index])
 
-    chat = model.start_chat()
-    prompt = f"""
-        Your job is to build APIs based on the context found in this directory.
-        Build the API by generating the necessary files and code.
+    misses = [index for index, plan in enumerate(plans) if plan is None]
+    if misses:
+        backend.prepare(declarations)
 
-        Then, generate the necessary files and code to build the API by running the
-        available functions.
+        def send(chunk):
+            with span('build_prompt', 'model', files=len(chunk)):
+                prompt = PROMPT_TEMPLATE.format(context=format_context(chunk))
+            return request_plan(backend, prompt)
 
-        Use the following context to generate the API:
-            {context}
+        results = generate_plans([chunks[index] for index in misses], send, concurrency)
+        for index, plan in zip(misses, results):
+            plans[index] = plan
+            if cache:
+                cache.put(keys[index], plan)
 
-        Order of Tasks:
-            - Create the project folder first.
-            - Install the necessary dependencies.
-            - Create the entrypoint file before generating controllers.
-            - Generate the service index. Only ever call this once.
-            - Generate the controller index. Only ever call this once.
-            - Generate a service for each endpoint found. This may include all endpoints in open api specs, json files, or other files.
-            - Generate a route/controller for each service function found.
-            - Always group similar routes together in the same controller by using the same controller name to construct the controller.
-            - Always format the code using prettier when all tasks are complete.
+    if cache:
+        cache.log_stats()
+
+    return merge_plans(plans)
 
-        """
-    response = chat.send_message(prompt)
 
-    logger.info("Model Response:")
-    logger.info(response)
+"""
+Runs the application. This is the main function that is called to generate the API.
+`nowde.config.json` in the context directory configures the generated API, also when replaying, and
+`server` overrides its server settings.
+A replay plan skips the model entirely. OpenAPI and Swagger specs found in the context are compiled
+directly into a plan, and the model is only consulted for the remaining context files. The merged plan
+is written to `plan_path` if given, so it can be replayed.
+"""
+def run(path, output_dir='.', workers=None, replay=None, plan_path=None, use_cache=True, cache_dir=DEFAULT_CACHE_DIR, cache_max_bytes=DEFAULT_MAX_BYTES, max_file_bytes=DEFAULT_MAX_FILE_BYTES, max_context_bytes=DEFAULT_MAX_TOTAL_BYTES, offline=False, prettier=False, concurrency=DEFAULT_CONCURRENCY, max_chunk_bytes=DEFAULT_MAX_CHUNK_BYTES, server=None, backend=DEFAULT_BACKEND, model=None, endpoint=None, compact=True):
+    logger.info("Starting the application.")
+    config = load_config(path)
+    options = {"cache_dir": cache_dir, "offline": offline, "prettier": prettier, "config": config, "server": {**config["server"], **(server or {})}}
+
+    if replay:
+        logger.info(f"Replaying plan from {replay}.")
+        plan = load_plan(replay)
+        check_routes(plan, config["routes"]["router"])
+        execute_plan(plan, execute_function, output_dir, workers, options)
+        return
+
+    with span('load_context', 'context') as trace:
+        context = get_context(path, max_file_bytes, max_context_bytes)
+        trace.update(files=len(context), bytes=sum(len(entry['content']) for entry in context))
+    with span('compile_specs', 'context') as trace:
+        specs, rest = split_specs(context)
+        plans = [compile_spec(spec) for spec in specs]
+        trace['specs'] = len(specs)
+    if rest or not specs:
+        plans.append(get_model_plan(rest, get_backend(backend, model, endpoint), use_cache, cache_dir, cache_max_bytes, concurrency, max_chunk_bytes, compact))
+    else:
+        logger.info("All context files are API specs, skipping the model.")
 
-    for part in response.parts:
-        if fn := part.function_call:
-            execute_function(fn, fn.args)
+    plan = merge_plans(plans)
+    check_routes(plan, config["routes"]["router"])
+    if plan_path:
+        os.makedirs(os.path.dirname(os.path.abspath(plan_path)), exist_ok=True)
+        save_plan(plan_path, plan)
+        logger.info(f"Saved the plan to {plan_path}.")
+    execute_plan(plan, execute_function, output_dir, workers, options)
@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = os.path.join('.nowde', 'manifest.json')
+
+"""
+Returns the content hash used to decide whether a generated file changed.
+"""
+def hash_content(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+"""
+Tracks the files generated into a project and the function calls that produced them.
+The manifest from the previous run is compared against this run so unchanged files are not
+rewritten, files no longer produced by the plan are removed, and expensive steps such as
+installing dependencies and formatting are skipped when nothing relevant changed.
+"""
+class Manifest:
+    def __init__(self, root='.'):
+        self.root = root
+        self.path = os.path.join(root, MANIFEST_PATH)
+        self.previous = self.load()
+        self.files = {}
+        self.steps = {}
+        self.written = []
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {"files": {}, "steps": {}}
+        except (ValueError, OSError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return {"files": {}, "steps": {}}
+        data.setdefault("files", {})
+        data.setdefault("steps", {})
+        return data
+
+    """
+    Records the content generated for a file and writes it only if it differs from what the
+    previous run produced, or if the file went missing on disk.
+    """
+    def write(self, path, content, function, args):
+        path = os.path.normpath(path)
+        digest = hash_content(content)
+        previous = self.previous["files"].get(path)
+        full_path = os.path.join(self.root, path)
+        unchanged = previous is not None and previous.get("hash") == digest and os.path.exists(full_path)
+
+        with self.lock:
+            entry = self.files.setdefault(path, {"calls": []})
+            entry["calls"].append({"function": function, "args": args})
+            entry["hash"] = digest
+            unchanged = unchanged and path not in self.written
+            if not unchanged and path not in self.written:
+                self.written.append(path)
+
+        if unchanged:
+            logger.info(f"Unchanged, skipping write: {path}")
+            return False
+
+        with span('write_file', 'io', path=path) as trace:
+            with open(full_path, 'w') as f:
+                trace['bytes'] = f.write(content)
+        return True
+
+    """
+    Returns True if a step ran previously with the same inputs.
+    """
+    def step_is_current(self, name, inputs):
+        return self.previous["steps"].get(name) == inputs
+
+    def record_step(self, name, inputs):
+        with self.lock:
+            self.steps[name] = inputs
+
+    """
+    Removes files generated by the previous run that this run no longer produces.
+    """
+    def remove_orphans(self):
+        removed = []
+        for path in self.previous["files"]:
+            if path in self.files:
+                continue
+            full_path = os.path.join(self.root, path)
+            try:
+                os.remove(full_path)
+            except FileNotFoundError:
+                continue
+            removed.append(path)
+            logger.info(f"Removed orphaned file: {path}")
+            # Clean up directories left empty, such as a removed service's folder.
+            directory = os.path.dirname(full_path)
+            while directory and os.path.abspath(directory) != os.path.abspath(self.root):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+        return removed
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Steps that did not run this time keep their previous record.
+        steps = dict(self.previous["steps"])
+        steps.update(self.steps)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"files": self.files, "steps": steps}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
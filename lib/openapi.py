@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import logging
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+HTTP_METHODS = ['get', 'post', 'put', 'patch', 'delete', 'head', 'options']
+
+# Names that cannot be used as javascript identifiers for generated imports.
+RESERVED_WORDS = {
+    'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default', 'delete', 'do',
+    'else', 'enum', 'export', 'extends', 'false', 'finally', 'for', 'function', 'if', 'import', 'in',
+    'instanceof', 'new', 'null', 'return', 'super', 'switch', 'this', 'throw', 'true', 'try', 'typeof',
+    'var', 'void', 'while', 'with', 'yield', 'let', 'static', 'await', 'express', 'router',
+}
+
+PATH_PARAM = re.compile(r'\{([^}]+)\}')
+WORD = re.compile(r'[A-Za-z0-9]+')
+
+"""
+Parses a JSON or YAML context file. Returns None if the file is not a structured document.
+"""
+def parse_document(path, content):
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension in ('.yaml', '.yml'):
+            if yaml is None:
+                logger.warning(f"PyYAML is not installed, {path} will be sent to the model as text.")
+                return None
+            return yaml.load(content, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        elif extension == '.json' or content.lstrip().startswith('{'):
+            return json.loads(content)
+    except ValueError:
+        return None
+    except Exception as e:
+        # yaml errors do not share a base class with ValueError.
+        logger.info(f"Unable to parse {path}: {e}")
+        return None
+    return None
+
+
+"""
+Parses a context file as an OpenAPI 3 or Swagger 2 document.
+Returns the document, or None if the file is not a well-formed spec.
+"""
+def parse_spec(path, content):
+    document = parse_document(path, content)
+    if not isinstance(document, dict) or not isinstance(document.get('paths'), dict):
+        return None
+    if str(document.get('openapi', '')).startswith('3') or str(document.get('swagger', '')) == '2.0':
+        return document
+    return None
+
+
+"""
+Splits the context into parsed specs and the entries that still need the model.
+"""
+def split_specs(context):
+    specs = []
+    rest = []
+    for entry in context:
+        spec = parse_spec(entry["path"], entry["content"])
+        if spec is None:
+            rest.append(entry)
+        else:
+            logger.info(f"Found API spec: {entry['path']}")
+            specs.append(spec)
+    return specs, rest
+
+
+"""
+Converts any name into a camel case javascript identifier.
+"""
+def to_identifier(name, fallback='value'):
+    words = WORD.findall(name)
+    if not words:
+        return fallback
+    identifier = words[0][0].lower() + words[0][1:] + ''.join(w[0].upper() + w[1:] for w in words[1:])
+    if identifier[0].isdigit():
+        identifier = f"{fallback}{identifier[0].upper()}{identifier[1:]}"
+    return identifier
+
+
+"""
+Returns the base url of the upstream API described by the spec.
+"""
+def get_base_url(spec):
+    if 'swagger' in spec:
+        host = spec.get('host')
+        base_path = spec.get('basePath', '')
+        if not host:
+            return base_path.rstrip('/')
+        scheme = (spec.get('schemes') or ['https'])[0]
+        return f"{scheme}://{host}{base_path}".rstrip('/')
+
+    servers = spec.get('servers') or [{}]
+    server = servers[0] if isinstance(servers[0], dict) else {}
+    url = server.get('url', '')
+    for name, variable in (server.get('variables') or {}).items():
+        url = url.replace(f"{{{name}}}", str(variable.get('default', '')))
+    return url.rstrip('/')
+
+
+"""
+Returns a snake case project name based on the spec title.
+"""
+def get_project_name(spec):
+    title = (spec.get('info') or {}).get('title') or ''
+    words = WORD.findall(title)
+    return '_'.join(w.lower() for w in words) or 'node_api'
+
+
+"""
+Returns the controller an operation belongs to, the path the controller is mounted at and the endpoint
+within that controller. Operations are grouped by the first static segment of their path, which is the
+entity being resolved and is mounted as is. Paths starting with a parameter, and `/` itself, belong to
+the `root` controller mounted at `/`.
+"""
+def get_route(path, params):
+    segments = [s for s in path.split('/') if s]
+    entity = None
+    if segments and not PATH_PARAM.fullmatch(segments[0]):
+        entity = segments.pop(0)
+
+    controller_name = to_identifier(entity or 'root', 'root')
+    if controller_name in RESERVED_WORDS:
+        controller_name = f"{controller_name}Controller"
+
+    endpoint = []
+    for segment in segments:
+        endpoint.append(PATH_PARAM.sub(lambda m: f":{params[m.group(1)]}", segment))
+    return controller_name, f"/{entity or ''}", '/' + '/'.join(endpoint)
+
+
+"""
+Compiles a spec into the plan of function calls `execute_function` understands, without the model.
+"""
+def compile_spec(spec):
+    base_url = get_base_url(spec)
+    services = []
+    service_names = set()
+    controllers = {}
+    mounts = {}
+
+    for path, item in spec['paths'].items():
+        if not isinstance(item, dict):
+            continue
+        for method in HTTP_METHODS:
+            operation = item.get(method)
+            if not isinstance(operation, dict):
+                continue
+
+            params = {name: to_identifier(name, 'param') for name in PATH_PARAM.findall(path)}
+
+            service_name = to_identifier(operation.get('operationId') or f"{method} {path.replace('{', ' by ')}", 'operation')
+            if service_name in RESERVED_WORDS:
+                service_name = f"{service_name}Service"
+            unique_name = service_name
+            count = 2
+            while unique_name in service_names:
+                unique_name = f"{service_name}{count}"
+                count += 1
+            service_names.add(unique_name)
+
+            uri = base_url + PATH_PARAM.sub(lambda m: f"${{params.{params[m.group(1)]}}}", path)
+            services.append({"name": "generate_service", "args": {"service_name": unique_name, "uri": uri, "method": method.upper()}})
+
+            controller_name, mount, endpoint = get_route(path, params)
+            mounts.setdefault(controller_name, mount)
+            controllers.setdefault(controller_name, []).append({
+                "name": "generate_controller",
+                "args": {"controller_name": controller_name, "services": [unique_name], "method": method.upper(), "endpoint": endpoint},
+            })
+
+    logger.info(f"Compiled {len(services)} operations into {len(controllers)} controllers.")
+
+    plan = [
+        {"name": "create_project_folder", "args": {"project_name": get_project_name(spec)}},
+        {"name": "install_dependencies", "args": {"project_name": get_project_name(spec)}},
+        {"name": "generate_entrypoint", "args": {}},
+        {"name": "generate_services_index", "args": {"service_names": [s["args"]["service_name"] for s in services]}},
+        {"name": "generate_controller_index", "args": {"controller_names": list(controllers), "mounts": mounts}},
+    ]
+    plan.extend(services)
+    for routes in controllers.values():
+        plan.extend(routes)
+    plan.append({"name": "format_files", "args": {}})
+    return plan
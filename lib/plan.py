@@ -0,0 +1,159 @@
+import logging
+from .routes import build_route_table, check_radix_endpoint
+
+logger = logging.getLogger(__name__)
+
+# Order in which the steps of a plan are executed, mirroring the order of tasks in the prompt.
+STEP_ORDER = [
+    'create_project_folder',
+    'install_dependencies',
+    'generate_entrypoint',
+    'generate_services_index',
+    'generate_controller_index',
+    'generate_service',
+    'generate_controller',
+    'format_files',
+]
+
+SINGLETON_STEPS = ['create_project_folder', 'install_dependencies', 'generate_entrypoint', 'format_files']
+
+class InvalidPlanError(Exception):
+    pass
+
+"""
+Returns a new list that keeps the first occurrence of each item.
+"""
+def unique(items):
+    seen = set()
+    result = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            result.append(item)
+    return result
+
+
+def get_service_key(args):
+    return (args.get('service_path', 'src/services'), args.get('service_name'))
+
+
+def get_upstream(args):
+    return (args.get('uri'), (args.get('method') or 'GET').upper())
+
+
+"""
+Returns the new names of the services of a plan that clash with a service of an earlier plan calling
+another upstream, e.g. `getUser` of two different specs. `services` maps the services of the earlier
+plans to their upstream.
+"""
+def get_renames(plan, services):
+    names = {key[1] for key in services} | {(step.get("args") or {}).get('service_name') for step in plan}
+    renames = {}
+    for step in plan:
+        args = step.get("args") or {}
+        if step["name"] != 'generate_service' or args.get('service_name') in renames:
+            continue
+        key = get_service_key(args)
+        if key not in services or services[key] == get_upstream(args):
+            continue
+        count = 2
+        while f"{key[1]}{count}" in names:
+            count += 1
+        renames[key[1]] = f"{key[1]}{count}"
+        names.add(renames[key[1]])
+        logger.warning(f"Service {key[1]} calls another upstream than an earlier service of the same name, renaming it to {renames[key[1]]}.")
+    return renames
+
+
+"""
+Merges several plans into one that can be executed once.
+Steps that should only run once keep their first occurrence, index steps are combined into a single
+call listing every name, duplicate services and routes are dropped, and the result is ordered by
+`STEP_ORDER` while keeping the relative order of steps of the same kind. A service named like one of
+an earlier plan but calling another upstream is renamed, along with the routes and index of its plan.
+"""
+def merge_plans(plans):
+    merged = []
+    singletons = set()
+    services = {}
+    routes = {}
+    services_indexes = {}
+    controller_indexes = {}
+
+    for plan in plans:
+        renames = get_renames(plan, services)
+        for step in plan:
+            name = step["name"]
+            args = dict(step.get("args") or {})
+            step = {"name": name, "args": args}
+            if renames:
+                if name == 'generate_service':
+                    args["service_name"] = renames.get(args.get('service_name'), args.get('service_name'))
+                elif name == 'generate_controller':
+                    args["services"] = [renames.get(service, service) for service in args.get('services') or []]
+                elif name == 'generate_services_index':
+                    args["service_names"] = [renames.get(service, service) for service in args.get('service_names') or []]
+
+            if name in SINGLETON_STEPS:
+                if name in singletons:
+                    continue
+                singletons.add(name)
+            elif name == 'generate_services_index':
+                service_path = args.get('service_path', 'src/services')
+                if service_path in services_indexes:
+                    existing = services_indexes[service_path]["args"]
+                    existing["service_names"] = unique(existing["service_names"] + list(args.get('service_names', [])))
+                    continue
+                args["service_names"] = unique(args.get('service_names', []))
+                services_indexes[service_path] = step
+            elif name == 'generate_controller_index':
+                controller_path = args.get('controller_path', 'src/controllers')
+                if controller_path in controller_indexes:
+                    existing = controller_indexes[controller_path]["args"]
+                    existing["controller_names"] = unique(existing["controller_names"] + list(args.get('controller_names', [])))
+                    if args.get('mounts'):
+                        existing["mounts"] = {**args['mounts'], **(existing.get('mounts') or {})}
+                    continue
+                args["controller_names"] = unique(args.get('controller_names', []))
+                controller_indexes[controller_path] = step
+            elif name == 'generate_service':
+                key = get_service_key(args)
+                if key in services:
+                    logger.info(f"Dropping duplicate service: {key[1]}")
+                    continue
+                services[key] = get_upstream(args)
+            elif name == 'generate_controller':
+                key = (args.get('controller_path', 'src/controllers'), args.get('controller_name'), args.get('method', 'GET').upper(), args.get('endpoint') or '/')
+                if key in routes:
+                    if routes[key] != args.get('services'):
+                        logger.warning(f"Dropping route {key[2]} {key[1]}{key[3]} calling {args.get('services')}, it already calls {routes[key]}.")
+                    else:
+                        logger.info(f"Dropping duplicate route: {key[2]} {key[1]}{key[3]}")
+                    continue
+                routes[key] = args.get('services')
+
+            merged.append(step)
+
+    order = {name: index for index, name in enumerate(STEP_ORDER)}
+    return sorted(merged, key=lambda step: order.get(step["name"], len(STEP_ORDER)))
+
+
+"""
+Raises InvalidPlanError if the routes of a plan cannot be generated, e.g. two controllers routing to
+the same path or an endpoint the radix router cannot match, before anything is written.
+"""
+def check_routes(plan, router='express'):
+    try:
+        for step in plan:
+            args = step.get("args") or {}
+            if step["name"] == 'generate_controller_index':
+                routes = [route for _, route in build_route_table(args.get('controller_names', []), args.get('mounts'))]
+            elif step["name"] == 'generate_controller':
+                routes = [args.get('endpoint')]
+            else:
+                continue
+            if router == 'radix':
+                for route in routes:
+                    check_radix_endpoint(route)
+    except ValueError as e:
+        raise InvalidPlanError(f"Invalid plan: {e}") from e
@@ -0,0 +1,48 @@
+import os
+import logging
+import threading
+from .manifest import Manifest
+from .controller import Controller
+
+logger = logging.getLogger(__name__)
+
+"""
+A generated project rooted at an explicit directory.
+Every generator resolves its paths against `root` instead of the process working directory, which
+lets independent steps of a plan run concurrently. `options` holds run wide settings such as the cache
+directory.
+"""
+class Project:
+    def __init__(self, root, options=None):
+        self.root = root
+        self.options = options or {}
+        self.manifest = Manifest(root)
+        self.controllers = {}
+        self.streams = set()
+        self.lock = threading.Lock()
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def makedirs(self, *parts):
+        os.makedirs(self.path(*parts), exist_ok=True)
+
+    def write(self, path, content, function, args):
+        return self.manifest.write(path, content, function, args)
+
+    """
+    Returns the in memory controller for the name, creating it on first use.
+    """
+    def controller(self, name, path):
+        key = (path, name)
+        with self.lock:
+            if key not in self.controllers:
+                self.controllers[key] = Controller(name, path)
+            return self.controllers[key]
+
+    """
+    Records a service that can stream its upstream response.
+    """
+    def add_stream(self, service_name):
+        with self.lock:
+            self.streams.add(service_name)
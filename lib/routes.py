@@ -0,0 +1,81 @@
+import re
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+UPPERCASE = re.compile(r'[A-Z]')
+# Path segments the radix router matches: static text or an express style `:param`.
+RADIX_SEGMENT = re.compile(r'[\w.~-]*|:\w+')
+
+"""
+Returns the kebab case route name of a controller, e.g. `getUserPosts` becomes `user-posts`.
+"""
+def to_route_name(controller_name):
+    route_name = UPPERCASE.sub(lambda match: '-' + match.group().lower(), controller_name).lstrip('-')
+    route_name = route_name[:-len('-controller')] if route_name.endswith('-controller') else route_name
+    return route_name[len('get-'):] if route_name.startswith('get-') else route_name
+
+
+# inflect takes seconds to import, so it is only loaded when a route table is built.
+@lru_cache(maxsize=None)
+def get_inflect_engine():
+    import inflect
+    return inflect.engine()
+
+
+@lru_cache(maxsize=None)
+def singularize(name):
+    return get_inflect_engine().singular_noun(name) or name
+
+
+"""
+Returns the route table of the controllers index, a list of `(controller_name, path)` in the order the
+controllers were given, except that controllers mounted at `/` come last. Their routes start with a
+parameter, which express would otherwise match before the static paths of the controllers after them.
+Repeated controllers are mounted once. Controllers listed in `mounts`, such as
+the ones compiled from a spec, are mounted at the path given there. The others are mounted at the
+singular of their route name; when two share it, e.g. `user` and `users`, the one already named in the
+singular keeps it and the other is mounted at its name as given. A ValueError is raised when no path
+is free.
+"""
+def build_route_table(controller_names, mounts=None):
+    mounts = mounts or {}
+    route_names = {name: to_route_name(name) for name in controller_names if name not in mounts}
+    mounted = {}
+    for controller_name in dict.fromkeys(controller_names):
+        if controller_name in mounts:
+            path = mounts[controller_name]
+            if path in mounted:
+                raise ValueError(f"Controllers {mounted[path]} and {controller_name} are both mounted at {path}.")
+            mounted[path] = controller_name
+    # Controllers named in the singular claim their path first, so `users` never takes `/user` from `user`.
+    for controller_name, route_name in route_names.items():
+        if singularize(route_name) == route_name and f'/{route_name}' not in mounted:
+            mounted[f'/{route_name}'] = controller_name
+    claimed = set(mounted.values())
+    for controller_name, route_name in route_names.items():
+        if controller_name in claimed:
+            continue
+        for candidate in dict.fromkeys((f'/{singularize(route_name)}', f'/{route_name}')):
+            if candidate not in mounted:
+                break
+        else:
+            raise ValueError(f"Controllers {mounted[candidate]} and {controller_name} both route to {candidate}.")
+        if candidate != f'/{singularize(route_name)}':
+            logger.warning(f"/{singularize(route_name)} is used by {mounted[f'/{singularize(route_name)}']}, mounting {controller_name} at {candidate}.")
+        mounted[candidate] = controller_name
+
+    paths = {controller_name: path for path, controller_name in mounted.items()}
+    table = [(controller_name, paths[controller_name]) for controller_name in dict.fromkeys(controller_names)]
+    return sorted(table, key=lambda route: route[1] == '/')
+
+
+"""
+Raises a ValueError if the radix router cannot match the endpoint, which only supports static and
+`:param` segments, not the patterns, optional parameters and wildcards of express.
+"""
+def check_radix_endpoint(endpoint):
+    for segment in (endpoint or '/').split('/'):
+        if not RADIX_SEGMENT.fullmatch(segment):
+            raise ValueError(f"The radix router does not support the segment {segment!r} of {endpoint}, use the express router instead.")
@@ -0,0 +1,94 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import subprocess
+from .cache import DEFAULT_CACHE_DIR
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate every cached skeleton, e.g. when the layout of the cache changes.
+SKELETON_VERSION = 1
+
+class SkeletonCacheError(Exception):
+    pass
+
+
+"""
+Returns the key of the skeleton for a set of dependencies.
+"""
+def get_skeleton_key(dependencies):
+    data = json.dumps({"version": SKELETON_VERSION, "dependencies": sorted(dependencies)})
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+
+"""
+Installs the dependencies into a new skeleton directory. The skeleton is built in a temporary directory
+and renamed into place so concurrent builds never expose a partial install; if another process wins the
+race its skeleton is used instead.
+"""
+def build_skeleton(path, dependencies):
+    logger.info(f"Building dependency skeleton {path}.")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        with open(os.path.join(tmp_path, 'package.json'), 'w') as f:
+            json.dump({"name": "nowde-skeleton", "version": "1.0.0", "private": True}, f, indent=2)
+        with span('npm install', 'subprocess', dependencies=list(dependencies)):
+            subprocess.run(['npm', 'install', '--no-audit', '--no-fund', *dependencies], cwd=tmp_path, check=True)
+        os.rename(tmp_path, path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+        logger.info(f"Skeleton {path} was built concurrently, using it.")
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+"""
+Returns the path of the cached skeleton for the dependencies, installing it first if the cache is cold.
+In offline mode a cold cache is an error instead.
+"""
+def ensure_skeleton(dependencies, cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    skeleton_dir = os.path.join(cache_dir, 'skeletons')
+    path = os.path.join(skeleton_dir, get_skeleton_key(dependencies))
+    if os.path.isdir(path):
+        logger.info(f"Using cached dependency skeleton {path}.")
+        return path
+    if offline:
+        raise SkeletonCacheError(
+            f"No cached dependency skeleton for {', '.join(sorted(dependencies))} in {skeleton_dir}. "
+            "Run once without --offline to populate the cache."
+        )
+    os.makedirs(skeleton_dir, exist_ok=True)
+    build_skeleton(path, dependencies)
+    return path
+
+
+"""
+Links a file into place, falling back to a copy when hard links are not possible (e.g. across devices).
+"""
+def link_file(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+"""
+Materializes the cached `node_modules` into the project root using hard links, so a new project costs a
+directory walk rather than an install. The lockfile is copied since npm rewrites it in place.
+Returns the dependencies recorded in the skeleton.
+"""
+def materialize_skeleton(skeleton, root):
+    node_modules = os.path.join(root, 'node_modules')
+    shutil.rmtree(node_modules, ignore_errors=True)
+    shutil.copytree(os.path.join(skeleton, 'node_modules'), node_modules, symlinks=True, copy_function=link_file)
+
+    shutil.copyfile(os.path.join(skeleton, 'package-lock.json'), os.path.join(root, 'package-lock.json'))
+
+    with open(os.path.join(skeleton, 'package.json'), 'r') as f:
+        return json.load(f).get('dependencies', {})
@@ -0,0 +1,752 @@
+import re
+import json
+import textwrap
+from functools import lru_cache
+
+IDENTIFIER = re.compile(r'^[A-Za-z_$][A-Za-z0-9_$]*$')
+INTERPOLATION = re.compile(r'\$\{([^}]*)\}')
+# The only interpolation URIs may contain: a path parameter of the request, e.g. `${params.id}`.
+PARAM_ACCESS = re.compile(r'^\s*params\.[A-Za-z_$][A-Za-z0-9_$]*\s*$')
+PLACEHOLDER = re.compile(r'^([ \t]*)\{\{\s*(\w+)\s*\}\}[ \t]*\n|\{\{\s*(\w+)\s*\}\}', re.M)
+MAX_LINE = 80
+
+"""
+A template compiled once into literal text and placeholders. `{{ name }}` inserts a value inline. A
+placeholder alone on its line inserts a block: every line of the value (a string or a list of strings)
+is indented like the placeholder, and the line is dropped when the value is empty. Runs of blank lines
+are collapsed, so the output matches what prettier would produce.
+"""
+class Template:
+    def __init__(self, source):
+        self.parts = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            self.parts.append(('text', source[position:match.start()], None))
+            if match.group(2):
+                self.parts.append(('block', match.group(2), match.group(1)))
+            else:
+                self.parts.append(('inline', match.group(3), None))
+            position = match.end()
+        self.parts.append(('text', source[position:], None))
+
+    def render(self, **values):
+        output = []
+        for kind, value, indent in self.parts:
+            if kind == 'text':
+                output.append(value)
+            elif kind == 'inline':
+                # Continuation lines of a multi-line value are indented like the line it starts on.
+                text = str(values[value])
+                if "\n" in text:
+                    line = "".join(output).rsplit("\n", 1)[-1]
+                    indent = line[:len(line) - len(line.lstrip())]
+                    text = text.replace("\n", "\n" + indent)
+                output.append(text)
+            else:
+                block = values[value]
+                if isinstance(block, (list, tuple)):
+                    block = "\n".join(block)
+                for line in block.splitlines():
+                    output.append(f"{indent}{line}\n" if line else "\n")
+        return re.sub(r'\n{3,}', '\n\n', "".join(output)).rstrip() + "\n"
+
+
+"""
+Returns the name if it is a valid JavaScript identifier. Names come from the model or a spec and end
+up in generated code, so anything else is rejected rather than written.
+"""
+def identifier(name):
+    if not isinstance(name, str) or not IDENTIFIER.match(name):
+        raise ValueError(f"{name!r} is not a valid JavaScript identifier.")
+    return name
+
+
+"""
+Returns a double quoted JavaScript string literal.
+"""
+def string(value):
+    return json.dumps(str(value))
+
+
+"""
+Returns a JavaScript template literal. `${...}` interpolations of path parameters, such as
+`${params.id}`, are kept; any other `${`, e.g. `${process.env.SECRET}` in a URI written by the model,
+and all backticks and backslashes are escaped.
+"""
+def template_literal(value):
+    value = str(value).replace('\\', '\\\\').replace('`', '\\`')
+    parts = []
+    position = 0
+    for match in INTERPOLATION.finditer(value):
+        text = value[position:match.start()].replace('${', '\\${')
+        expression = match.group(0) if PARAM_ACCESS.match(match.group(1)) else match.group(0).replace('${', '\\${', 1)
+        parts.append(text + expression)
+        position = match.end()
+    parts.append(value[position:].replace('${', '\\${'))
+    return f"`{''.join(parts)}`"
+
+
+"""
+Returns the local names a module binds `names` to, a dict keeping each name unless it is in `taken`, in
+which case the first free numbered name is used instead, e.g. `request2`. Generated modules bind names
+that come from the model or a spec next to their own, so clashing imports are aliased rather than
+declared twice. The names returned are added to `taken`.
+"""
+def local_names(names, taken):
+    result = {}
+    for name in names:
+        local = identifier(name)
+        count = 2
+        while local in taken:
+            local = f"{name}{count}"
+            count += 1
+        taken.add(local)
+        result[name] = local
+    return result
+
+
+"""
+Returns an object literal of shorthand properties, on one line if it fits after `prefix`, otherwise one
+property per line. `names` may map each property to a local name, written out when they differ.
+"""
+def shorthand_object(names, prefix=''):
+    names = names if isinstance(names, dict) else {name: name for name in names}
+    properties = [identifier(name) if name == local else f"{identifier(name)}: {identifier(local)}" for name, local in names.items()]
+    inline = f"{{ {', '.join(properties)} }}"
+    if len(prefix) + len(inline) + 1 <= MAX_LINE:
+        return inline
+    return "{\n" + "".join(f"  {item},\n" for item in properties) + "}"
+
+
+"""
+Returns a call expression, with one argument per line if it does not fit after `prefix`.
+"""
+def call(callee, arguments, prefix=''):
+    inline = f"{callee}({', '.join(arguments)})"
+    if len(prefix) + len(inline) + 1 <= MAX_LINE:
+        return inline
+    return f"{callee}(\n" + "".join(f"  {argument},\n" for argument in arguments) + ")"
+
+
+"""
+Returns an import statement of named exports, wrapped one name per line if it is too long. `names` may
+map each export to the local name it is imported as.
+"""
+def named_import(names, path):
+    names = names if isinstance(names, dict) else {name: name for name in names}
+    names = [identifier(name) if name == local else f"{identifier(name)} as {identifier(local)}" for name, local in names.items()]
+    statement = f"import {{ {', '.join(names)} }} from {string(path)};"
+    if len(statement) <= MAX_LINE:
+        return statement
+    return "import {\n" + "".join(f"  {name},\n" for name in names) + f"}} from {string(path)};"
+
+
+def source(text):
+    return textwrap.dedent(text).lstrip('\n')
+
+
+TEMPLATES = {
+    'entrypoint': source('''
+        import express from "express";
+        import cors from "cors";
+        import helmet from "helmet";
+        {{ imports }}
+
+        const port = Number(process.env.PORT || {{ port }});
+        const host = process.env.HOST || {{ host }};
+        const SHUTDOWN_TIMEOUT = Number(process.env.SHUTDOWN_TIMEOUT_MS || 10000);
+        const BODY_LIMIT = process.env.BODY_LIMIT || "1mb";
+
+        const startServer = () => {
+          const app = express();
+
+          app.use(helmet());
+          app.use(cors());
+          app.use(express.json({ limit: BODY_LIMIT }));
+          // express.json sets the body of requests without one to {}, which
+          // must not be forwarded upstream as if the client had sent it.
+          app.use((req, res, next) => {
+            const { headers } = req;
+            if (
+              headers["content-length"] === undefined &&
+              headers["transfer-encoding"] === undefined
+            ) {
+              req.body = undefined;
+            }
+            next();
+          });
+          {{ routes }}
+          app.use("/", controllers);
+
+          const server = app.listen(port, host, () => {
+            console.log(`Server is running on http://${host || "localhost"}:${port}`);
+          });
+
+          // Stop accepting connections and exit once in flight requests are done.
+          const shutdown = () => {
+            server.close(() => process.exit(0));
+            server.closeIdleConnections();
+            setTimeout(() => process.exit(1), SHUTDOWN_TIMEOUT).unref();
+          };
+          process.once("SIGTERM", shutdown);
+          process.once("SIGINT", shutdown);
+        };
+
+        {{ start }}
+    '''),
+    'cluster': source('''
+        const WORKERS = Number(process.env.WORKERS || {{ workers }}) || os.availableParallelism();
+
+        const MAX_RESTARTS = Number(process.env.WORKER_MAX_RESTARTS || 10);
+        const RESTART_WINDOW = Number(process.env.WORKER_RESTART_WINDOW_MS || 60000);
+        const RESTART_DELAY = 100;
+        const MAX_RESTART_DELAY = 10000;
+
+        if (cluster.isPrimary) {
+          let stopping = false;
+          let exitCode = 0;
+          let restarts = [];
+          for (let i = 0; i < WORKERS; i++) {
+            cluster.fork();
+          }
+
+          const shutdown = () => {
+            stopping = true;
+            const workers = Object.values(cluster.workers);
+            if (workers.length === 0) {
+              process.exit(exitCode);
+            }
+            for (const worker of workers) {
+              worker.process.kill("SIGTERM");
+            }
+          };
+
+          // Replace workers that crash, waiting longer the more restarts happened
+          // recently. Workers that keep crashing, e.g. on a port already in use,
+          // stop the primary instead of restarting forever.
+          cluster.on("exit", (worker, code, signal) => {
+            if (stopping) {
+              if (Object.keys(cluster.workers).length === 0) {
+                process.exit(exitCode);
+              }
+              return;
+            }
+            const { pid } = worker.process;
+            const now = Date.now();
+            restarts = restarts.filter((time) => now - time < RESTART_WINDOW);
+            if (restarts.length >= MAX_RESTARTS) {
+              console.error(
+                `Worker ${pid} exited with ${signal || code}, ${restarts.length} ` +
+                  `restarts in ${RESTART_WINDOW}ms, stopping.`,
+              );
+              exitCode = 1;
+              shutdown();
+              return;
+            }
+            restarts.push(now);
+            const delay = Math.min(
+              RESTART_DELAY * 2 ** (restarts.length - 1),
+              MAX_RESTART_DELAY,
+            );
+            console.error(
+              `Worker ${pid} exited with ${signal || code}, restarting in ${delay}ms.`,
+            );
+            setTimeout(() => {
+              if (!stopping) {
+                cluster.fork();
+              }
+            }, delay);
+          });
+
+          process.once("SIGTERM", shutdown);
+          process.once("SIGINT", shutdown);
+        } else {
+          startServer();
+        }
+    '''),
+    'router': source('''
+        {{ imports }}
+
+        const router = {{ router }};
+
+        {{ routes }}
+
+        export default router;
+    '''),
+    'route': source('''
+        router.{{ method }}({{ endpoint }}, async (req, res) => {
+          const args = { params: req.params, body: req.body, query: req.query };
+          const services = {{ services }};
+          {{ send_results }}(res, await {{ invoke_services }}(services, args));
+        });
+    '''),
+    'result_route': source('''
+        router.{{ method }}({{ endpoint }}, async (req, res) => {
+          const args = { params: req.params, body: req.body, query: req.query };
+          await {{ send_result }}(res, {{ name }}, {{ service }}, args);
+        });
+    '''),
+    'stream_route': source('''
+        router.{{ method }}({{ endpoint }}, async (req, res) => {
+          const args = {
+            params: req.params,
+            body: req.body,
+            query: req.query,
+            incoming: req,
+          };
+          await {{ stream_service }}(res, {{ name }}, {{ service }}, args);
+        });
+    '''),
+    'service': source('''
+        {{ imports }}
+
+        {{ export }}const {{ name }} = async (args) => {
+          const { params, body, query, timeout } = args;
+          const url = {{ uri }};
+          return {{ request }}(url, { method: {{ method }}, query, body, timeout });
+        };
+
+        {{ wrapper }}
+    '''),
+    'cached_service': source('''
+        export const {{ name }} = {{ call }};
+    '''),
+    'stream_service': source('''
+        export const {{ name }} = async (args, res) => {
+          const { params, body, query, incoming, timeout } = args;
+          const url = {{ uri }};
+          const options = { method: {{ method }}, query, body, incoming, timeout };
+          return {{ proxy }}(url, options, res);
+        };
+    '''),
+    'http_client': source('''
+        import http from "node:http";
+        import https from "node:https";
+        import { pipeline } from "node:stream/promises";
+
+        const MAX_SOCKETS = Number(process.env.HTTP_MAX_SOCKETS || 64);
+        const KEEP_ALIVE_MSECS = Number(process.env.HTTP_KEEP_ALIVE_MSECS || 1000);
+        const TIMEOUT = Number(process.env.HTTP_TIMEOUT_MS || 30000);
+        const METHODS_WITHOUT_BODY = new Set(["GET", "HEAD"]);
+        const FORWARDED_HEADERS = [
+          "content-type",
+          "content-length",
+          "content-encoding",
+          "cache-control",
+          "etag",
+          "last-modified",
+          "expires",
+        ];
+
+        const agents = new Map();
+
+        // One keep-alive agent per upstream origin, so connections are reused.
+        const getAgent = (url) => {
+          let agent = agents.get(url.origin);
+          if (!agent) {
+            const Agent = url.protocol === "https:" ? https.Agent : http.Agent;
+            agent = new Agent({
+              keepAlive: true,
+              keepAliveMsecs: KEEP_ALIVE_MSECS,
+              maxSockets: MAX_SOCKETS,
+              maxFreeSockets: MAX_SOCKETS,
+              timeout: TIMEOUT,
+            });
+            agents.set(url.origin, agent);
+          }
+          return agent;
+        };
+
+        const toUrl = (uri, query) => {
+          const url = new URL(uri);
+          for (const [key, value] of Object.entries(query || {})) {
+            for (const item of [].concat(value)) {
+              url.searchParams.append(key, item);
+            }
+          }
+          return url;
+        };
+
+        // Returns the incoming request if it has a body express did not parse,
+        // such as form data or text, so it can be piped upstream as it came.
+        const getRawBody = (incoming) => {
+          if (!incoming || incoming.readableEnded) {
+            return undefined;
+          }
+          const { headers } = incoming;
+          const hasBody =
+            headers["content-length"] !== undefined ||
+            headers["transfer-encoding"] !== undefined;
+          return hasBody ? incoming : undefined;
+        };
+
+        const getBodyHeaders = (payload, raw) => {
+          if (raw) {
+            const headers = {};
+            for (const name of ["content-type", "content-length"]) {
+              if (raw.headers[name] !== undefined) {
+                headers[name] = raw.headers[name];
+              }
+            }
+            return headers;
+          }
+          if (payload === undefined) {
+            return {};
+          }
+          return {
+            "content-type": "application/json",
+            "content-length": Buffer.byteLength(payload),
+          };
+        };
+
+        // Sends the request and resolves with the upstream response once its
+        // headers arrive. `incoming` is the request of the client, whose body is
+        // piped through unless express already parsed it into `body`.
+        const open = (uri, options = {}) => {
+          const { query, body, incoming, headers = {}, timeout = TIMEOUT } = options;
+          const url = toUrl(uri, query);
+          const method = (options.method || "GET").toUpperCase();
+          const hasBody = !METHODS_WITHOUT_BODY.has(method);
+          const raw = hasBody ? getRawBody(incoming) : undefined;
+          const payload =
+            !hasBody || raw || body === undefined ? undefined : JSON.stringify(body);
+          const transport = url.protocol === "https:" ? https : http;
+
+          return new Promise((resolve, reject) => {
+            const req = transport.request(
+              url,
+              {
+                method,
+                agent: getAgent(url),
+                timeout,
+                headers: {
+                  accept: "application/json",
+                  ...getBodyHeaders(payload, raw),
+                  ...headers,
+                },
+              },
+              resolve,
+            );
+            req.on("timeout", () => {
+              const message = `Request to ${url.origin} timed out after ${timeout}ms`;
+              req.destroy(new Error(message));
+            });
+            req.on("error", reject);
+            if (raw) {
+              raw.on("error", (error) => req.destroy(error));
+              raw.pipe(req);
+            } else {
+              req.end(payload);
+            }
+          });
+        };
+
+        // Raised for upstream responses outside 2xx, with their status and body.
+        export class UpstreamError extends Error {
+          constructor(status, body) {
+            super(`Upstream responded with ${status}`);
+            this.status = status;
+            this.body = body;
+          }
+        }
+
+        const parse = (text) => {
+          try {
+            return text ? JSON.parse(text) : null;
+          } catch {
+            return text;
+          }
+        };
+
+        // Resolves with the parsed body of a 2xx response, rejects with an
+        // UpstreamError otherwise so failures are never treated as data.
+        export const request = async (uri, options) => {
+          const res = await open(uri, options);
+          const chunks = [];
+          for await (const chunk of res) {
+            chunks.push(chunk);
+          }
+          const body = parse(Buffer.concat(chunks).toString("utf8"));
+          if (res.statusCode < 200 || res.statusCode >= 300) {
+            throw new UpstreamError(res.statusCode, body);
+          }
+          return body;
+        };
+
+        // Pipes the upstream status, headers and body to the response without
+        // buffering the body.
+        export const proxy = async (uri, options, res) => {
+          const upstream = await open(uri, options);
+          res.status(upstream.statusCode);
+          for (const name of FORWARDED_HEADERS) {
+            if (upstream.headers[name] !== undefined) {
+              res.setHeader(name, upstream.headers[name]);
+            }
+          }
+          await pipeline(upstream, res);
+        };
+    '''),
+    'invoke_services': source('''
+        const SERVICE_TIMEOUT = Number(process.env.SERVICE_TIMEOUT_MS || 10000);
+
+        const invoke = async (service, args) => {
+          return service({ ...args, timeout: SERVICE_TIMEOUT });
+        };
+
+        const withTimeout = (promise, name) => {
+          let timer;
+          const expired = new Promise((_, reject) => {
+            timer = setTimeout(() => {
+              const message = `Service ${name} timed out after ${SERVICE_TIMEOUT}ms`;
+              reject(new Error(message));
+            }, SERVICE_TIMEOUT);
+          });
+          return Promise.race([promise, expired]).finally(() => clearTimeout(timer));
+        };
+
+        // Describes a failed service, with the status of the upstream response
+        // when it answered with an error rather than failing or timing out.
+        const describeError = (error) => {
+          const description = { message: error?.message || String(error) };
+          if (error?.status !== undefined) {
+            description.status = error.status;
+          }
+          return description;
+        };
+
+        export const invokeServices = async (services, args) => {
+          const names = Object.keys(services);
+          const results = await Promise.allSettled(
+            names.map((name) => withTimeout(invoke(services[name], args), name)),
+          );
+
+          const data = {};
+          const errors = {};
+          results.forEach((result, index) => {
+            if (result.status === "fulfilled") {
+              data[names[index]] = result.value;
+            } else {
+              console.error(result.reason);
+              errors[names[index]] = describeError(result.reason);
+            }
+          });
+          return { data, errors };
+        };
+
+        // Pipes a single service to the response. Errors after the response started
+        // abort it.
+        export const streamService = async (res, name, service, args) => {
+          try {
+            await service(args, res);
+          } catch (error) {
+            console.error(error);
+            if (res.headersSent) {
+              res.destroy(error);
+            } else {
+              res.status(502).json({ errors: { [name]: describeError(error) } });
+            }
+          }
+        };
+
+        // Responds with the result of a single service as is. Like streamService,
+        // upstream errors are passed through with their status and body.
+        export const sendResult = async (res, name, service, args) => {
+          try {
+            res.json(await withTimeout(invoke(service, args), name));
+          } catch (error) {
+            console.error(error);
+            if (error?.status !== undefined) {
+              res.status(error.status).json(error.body ?? null);
+            } else {
+              res.status(502).json({ errors: { [name]: describeError(error) } });
+            }
+          }
+        };
+
+        // Responds with the data of every service, adding `errors` when some failed,
+        // or 502 when all of them did.
+        export const sendResults = (res, { data, errors }) => {
+          if (Object.keys(errors).length === 0) {
+            res.json(data);
+          } else if (Object.keys(data).length === 0) {
+            res.status(502).json({ errors });
+          } else {
+            res.json({ ...data, errors });
+          }
+        };
+    '''),
+    'response_cache': source('''
+        const MAX_ENTRIES = Number(process.env.CACHE_MAX_ENTRIES || {{ max_entries }});
+
+        const entries = new Map();
+        const inflight = new Map();
+        const stats = { hits: 0, misses: 0, coalesced: 0, evictions: 0 };
+
+        const lookup = (key) => {
+          const entry = entries.get(key);
+          if (!entry) {
+            return undefined;
+          }
+          entries.delete(key);
+          if (entry.expires <= Date.now()) {
+            return undefined;
+          }
+          // Reinsert so the iteration order of the map is least recently used first.
+          entries.set(key, entry);
+          return entry;
+        };
+
+        const store = (key, value, ttl) => {
+          entries.delete(key);
+          entries.set(key, { value, expires: Date.now() + ttl * 1000 });
+          while (entries.size > MAX_ENTRIES) {
+            entries.delete(entries.keys().next().value);
+            stats.evictions++;
+          }
+        };
+
+        export const cached = (name, ttl, fn) => async (args) => {
+          const key = `${name}:${JSON.stringify([args.params, args.query])}`;
+          const entry = lookup(key);
+          if (entry) {
+            stats.hits++;
+            return entry.value;
+          }
+          if (inflight.has(key)) {
+            stats.coalesced++;
+            return inflight.get(key);
+          }
+
+          stats.misses++;
+          const pending = Promise.resolve()
+            .then(() => fn(args))
+            .then((value) => {
+              store(key, value, ttl);
+              return value;
+            })
+            .finally(() => inflight.delete(key));
+          inflight.set(key, pending);
+          return pending;
+        };
+
+        export const cacheStats = () => ({
+          ...stats,
+          entries: entries.size,
+          maxEntries: MAX_ENTRIES,
+        });
+    '''),
+    'radix_router': source('''
+        // Matches requests against a tree of path segments, so routing costs grow
+        // with the depth of the path rather than the number of routes. Supports
+        // static and `:param` segments, case insensitive and ignoring a trailing
+        // slash like express. Unlike express, which tries routes in the order
+        // they were registered, static segments take precedence over parameters
+        // regardless of order, e.g. `/users/me` matches before `/users/:id`.
+        const METHODS = ["get", "post", "put", "patch", "delete", "head", "options"];
+
+        const createNode = () => ({ children: new Map(), param: null, routes: {} });
+
+        const splitPath = (path) => path.split("/").filter(Boolean);
+
+        const joinPath = (prefix, path) => {
+          return `/${[...splitPath(prefix), ...splitPath(path)].join("/")}`;
+        };
+
+        const insert = (root, { method, path, handler }) => {
+          let node = root;
+          const names = [];
+          for (const segment of splitPath(path)) {
+            if (segment.startsWith(":")) {
+              names.push(segment.slice(1));
+              node.param ||= createNode();
+              node = node.param;
+            } else {
+              const key = segment.toLowerCase();
+              if (!node.children.has(key)) {
+                node.children.set(key, createNode());
+              }
+              node = node.children.get(key);
+            }
+          }
+          // Of routes with the same method and path, the first registered wins.
+          node.routes[method] ||= { handler, names };
+        };
+
+        const match = (node, method, segments, index, values) => {
+          if (index === segments.length) {
+            const { routes } = node;
+            return routes[method] || (method === "HEAD" && routes.GET) || null;
+          }
+          const child = node.children.get(segments[index].toLowerCase());
+          const found = child && match(child, method, segments, index + 1, values);
+          if (found) {
+            return found;
+          }
+          if (node.param) {
+            values.push(segments[index]);
+            const route = match(node.param, method, segments, index + 1, values);
+            if (route) {
+              return route;
+            }
+            values.pop();
+          }
+          return null;
+        };
+
+        // Returns a middleware with the express router methods used by the
+        // generated controllers. Routes of routers passed to `use` are copied with
+        // their prefix, and the tree is built on the first request.
+        export const createRouter = () => {
+          const routes = [];
+          let root = null;
+
+          const router = (req, res, next) => {
+            if (!root) {
+              root = createNode();
+              routes.forEach((route) => insert(root, route));
+            }
+            const values = [];
+            const segments = splitPath(req.url.split("?")[0]);
+            const route = match(root, req.method, segments, 0, values);
+            if (!route) {
+              return next();
+            }
+            try {
+              const params = values.map(decodeURIComponent);
+              req.params = Object.fromEntries(
+                route.names.map((name, index) => [name, params[index]]),
+              );
+            } catch (error) {
+              error.status = 400;
+              return next(error);
+            }
+            return route.handler(req, res, next);
+          };
+
+          router.routes = routes;
+          router.use = (prefix, child) => {
+            child.routes.forEach((route) => {
+              routes.push({ ...route, path: joinPath(prefix, route.path) });
+            });
+            root = null;
+            return router;
+          };
+          METHODS.forEach((method) => {
+            router[method] = (path, handler) => {
+              routes.push({ method: method.toUpperCase(), path, handler });
+              root = null;
+              return router;
+            };
+          });
+          return router;
+        };
+    '''),
+}
+
+@lru_cache(maxsize=None)
+def get_template(name):
+    return Template(TEMPLATES[name])
+
+
+def render(template, **values):
+    return get_template(template).render(**values)
@@ -0,0 +1,84 @@
+import os
+import json
+import logging
+import threading
+from time import perf_counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+"""
+Records timed spans of the generation stages. Recording is off unless `enable` is called, in which case
+`span` only costs a dictionary. Spans can be written as a Chrome trace (chrome://tracing, Perfetto).
+"""
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.lock = threading.Lock()
+        self.origin = perf_counter()
+
+    def enable(self):
+        self.enabled = True
+        self.origin = perf_counter()
+
+    """
+    Times the block as a span. The yielded dict is recorded as the span's args, so callers can attach
+    values only known at the end, such as token counts or bytes written.
+    """
+    @contextmanager
+    def span(self, name, category='nowde', **args):
+        if not self.enabled:
+            yield args
+            return
+        start = perf_counter()
+        try:
+            yield args
+        finally:
+            end = perf_counter()
+            with self.lock:
+                self.spans.append((name, category, start, end, threading.get_ident(), args))
+
+    def write_chrome_trace(self, path):
+        pid = os.getpid()
+        events = []
+        with self.lock:
+            spans = list(self.spans)
+        for name, category, start, end, tid, args in spans:
+            events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            })
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        logger.info(f"Wrote {len(events)} trace events to {path}.")
+
+    """
+    Logs the slowest span names by total time, with their call counts and slowest single call.
+    """
+    def log_summary(self, top=10):
+        totals = {}
+        with self.lock:
+            spans = list(self.spans)
+        for name, category, start, end, _, _ in spans:
+            count, total, slowest = totals.get((category, name), (0, 0.0, 0.0))
+            totals[(category, name)] = (count + 1, total + end - start, max(slowest, end - start))
+
+        rows = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        width = max([len(f"{category}:{name}") for (category, name), _ in rows] + [5])
+        logger.info(f"Slowest {len(rows)} stages:")
+        logger.info(f"  {'stage':<{width}}  {'calls':>6}  {'total s':>9}  {'max s':>9}")
+        for (category, name), (count, total, slowest) in rows:
+            logger.info(f"  {f'{category}:{name}':<{width}}  {count:>6}  {total:9.3f}  {slowest:9.3f}")
+
+
+tracer = Tracer()
+
+def span(name, category='nowde', **args):
+    return tracer.span(name, category, **args)
@@ -1,8 +1,15 @@
 #import logger
+import sys
 import logging
 from dotenv import load_dotenv
-from utils.environment import check_env_vars
-from lib.generate import run
+from lib.cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from lib.skeleton import SkeletonCacheError
+from lib.plan import InvalidPlanError
+from lib.config import ConfigError
+from lib.tracing import tracer
+from lib.context import DEFAULT_MAX_FILE_BYTES, DEFAULT_MAX_TOTAL_BYTES
+from lib.fanout import DEFAULT_CONCURRENCY, DEFAULT_MAX_CHUNK_BYTES
+from lib.backends import BACKENDS, DEFAULT_BACKEND, BackendError
 import click
 
 load_dotenv()
@@ -10,14 +17,76 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(asctime)s - %(name)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option('--context', default='./', help='Context directory')
+@click.option('--output', default='./', help='Directory the project folder is created in')
+@click.option('--workers', type=int, default=None, help='Number of threads used to execute the plan')
+@click.option('--replay', type=click.Path(exists=True, dir_okay=False), default=None, help='Execute a stored plan without calling the model')
+@click.option('--save-plan', type=click.Path(dir_okay=False), default=None, help='Write the merged plan to this file so it can be replayed')
+@click.option('--no-cache', is_flag=True, default=False, help='Always ask the model instead of reusing a cached plan')
+@click.option('--cache-dir', default=DEFAULT_CACHE_DIR, help='Directory used to cache model plans')
+@click.option('--cache-max-bytes', type=int, default=DEFAULT_MAX_BYTES, help='Maximum size of the plan cache before evicting old plans')
+@click.option('--max-file-bytes', type=int, default=DEFAULT_MAX_FILE_BYTES, help='Skip context files larger than this')
+@click.option('--max-context-bytes', type=int, default=DEFAULT_MAX_TOTAL_BYTES, help='Stop loading context once this many bytes are read')
+@click.option('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Maximum number of concurrent model requests')
+@click.option('--max-chunk-bytes', type=int, default=DEFAULT_MAX_CHUNK_BYTES, help='Split context into chunks of at most this size per model request')
+@click.option('--no-compact', is_flag=True, default=False, help='Send context files to the model as they are instead of compacting them')
+@click.option('--offline', is_flag=True, default=False, help='Never run npm install, fail if the dependency cache is cold')
+@click.option('--backend', type=click.Choice(list(BACKENDS)), default=DEFAULT_BACKEND, help='Model backend used to generate the plan')
+@click.option('--model', default=None, help='Model name passed to the backend, defaults to the backend default')
+@click.option('--endpoint', default=None, help='Backend endpoint: an API base URL, or a plan file or directory for the file backend')
+@click.option('--port', type=int, default=None, help='Port of the generated server, overriding the plan')
+@click.option('--host', default=None, help='Host the generated server binds to, overriding the plan')
+@click.option('--cluster', is_flag=True, default=None, help='Generate an entrypoint running one worker process per CPU')
+@click.option('--prettier', is_flag=True, default=False, help='Run prettier over the files changed by the run')
+@click.option('--profile', type=click.Path(dir_okay=False), default=None, help='Write a Chrome trace of the run to this file and log the slowest stages')
+@click.option('--profile-top', type=int, default=10, help='Number of stages listed in the --profile summary')
 @click.help_option('--help', '-h')
+@click.pass_context
+
+def main(ctx, context, output, workers, replay, save_plan, no_cache, cache_dir, cache_max_bytes, max_file_bytes, max_context_bytes, concurrency, max_chunk_bytes, no_compact, offline, backend, model, endpoint, port, host, cluster, prettier, profile, profile_top):
+    options = dict(workers=workers, use_cache=not no_cache, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes, max_file_bytes=max_file_bytes, max_context_bytes=max_context_bytes, offline=offline, prettier=prettier, concurrency=concurrency, max_chunk_bytes=max_chunk_bytes, compact=not no_compact, backend=backend, model=model, endpoint=endpoint)
+    server = dict(port=port, host=host, cluster=cluster)
+    options['server'] = {key: value for key, value in server.items() if value is not None}
+    if ctx.invoked_subcommand:
+        # Options given before a sub command apply to every run of that command.
+        ctx.obj = options
+        return
 
-def main(context):
     logger.info("Starting... 🚀")
-    check_env_vars()
-    run(context)
+    if profile:
+        tracer.enable()
+    # Imported here so --help and sub commands do not pay for loading the generator.
+    from lib.generate import run
+    try:
+        run(context, output_dir=output, replay=replay, plan_path=save_plan, **options)
+    except (SkeletonCacheError, BackendError, ConfigError, InvalidPlanError) as e:
+        logger.error(e)
+        sys.exit(1)
+    finally:
+        if profile:
+            tracer.write_chrome_trace(profile)
+            tracer.log_summary(profile_top)
+
+@main.command()
+@click.argument('contexts', nargs=-1, required=True)
+@click.option('--output', default='./', help='Root directory; each job is generated into a folder named after its context')
+@click.option('--jobs', type=int, default=None, help='Number of jobs run in parallel. Defaults to the number of CPUs')
+@click.help_option('--help', '-h')
+@click.pass_obj
+
+def batch(options, contexts, output, jobs):
+    """
+    Generates an API for each context directory. CONTEXTS are directories or globs, optionally followed
+    by =OUTPUT to choose the output directory of that job.
+    """
+    from lib.batch import expand_jobs, run_batch
+    expanded = expand_jobs(contexts, output)
+    if not expanded:
+        logger.error("No context directories matched.")
+        sys.exit(1)
+    if run_batch(expanded, options, jobs):
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -6,7 +6,14 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # Backends are imported by name when selected (see lib/backends/__init__.py), which the analysis
+    # cannot follow, so they and the SDKs they import are listed explicitly.
+    hiddenimports=[
+        'lib.backends.gemini',
+        'lib.backends.openai',
+        'lib.backends.file',
+        'google.generativeai',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,23 @@
+from lib.context import IgnoreRules
+
+
+def test_patterns_without_a_slash_match_at_any_depth():
+    rules = IgnoreRules(['*.log', 'build/'])
+    assert rules.ignored('app.log', False)
+    assert rules.ignored('logs/app.log', False)
+    assert rules.ignored('sub/build', True)
+    assert not rules.ignored('sub/build', False)
+
+
+def test_patterns_with_a_slash_are_anchored():
+    rules = IgnoreRules(['/docs', 'specs/old'])
+    assert rules.ignored('docs', True)
+    assert not rules.ignored('sub/docs', True)
+    assert rules.ignored('specs/old', True)
+    assert not rules.ignored('v1/specs/old', True)
+
+
+def test_negated_patterns_keep_paths():
+    rules = IgnoreRules(['*.json', '!openapi.json'])
+    assert rules.ignored('package.json', False)
+    assert not rules.ignored('openapi.json', False)
@@ -0,0 +1,50 @@
+from lib.openapi import compile_spec
+from lib.routes import build_route_table
+
+
+def make_spec(paths, url='https://api.example.com/v1'):
+    operations = {}
+    for path, methods in paths.items():
+        operations[path] = {method: {'operationId': name, 'responses': {'200': {'description': 'OK'}}} if name else {'responses': {}} for method, name in methods.items()}
+    return {'openapi': '3.0.0', 'info': {'title': 'Pet Store'}, 'servers': [{'url': url}], 'paths': operations}
+
+
+def get_steps(plan, name):
+    return [step["args"] for step in plan if step["name"] == name]
+
+
+def test_operations_become_services_calling_the_upstream():
+    plan = compile_spec(make_spec({'/pets/{petId}': {'get': 'showPet', 'delete': 'deletePet'}}))
+    assert get_steps(plan, 'generate_service') == [
+        {"service_name": 'showPet', "uri": 'https://api.example.com/v1/pets/${params.petId}', "method": 'GET'},
+        {"service_name": 'deletePet', "uri": 'https://api.example.com/v1/pets/${params.petId}', "method": 'DELETE'},
+    ]
+    assert get_steps(plan, 'create_project_folder') == [{"project_name": 'pet_store'}]
+
+
+def test_operations_are_grouped_by_first_segment_and_mounted_as_written():
+    plan = compile_spec(make_spec({'/pets': {'get': 'listPets'}, '/pets/{id}/toys': {'get': 'listToys'}}))
+    routes = get_steps(plan, 'generate_controller')
+    assert [(route["controller_name"], route["endpoint"]) for route in routes] == [('pets', '/'), ('pets', '/:id/toys')]
+    assert get_steps(plan, 'generate_controller_index') == [{"controller_names": ['pets'], "mounts": {'pets': '/pets'}}]
+
+
+def test_parameter_first_paths_are_mounted_after_static_paths():
+    plan = compile_spec(make_spec({'/{id}': {'get': 'getAny'}, '/': {'get': 'index'}, '/status': {'get': 'getStatus'}}))
+    routes = get_steps(plan, 'generate_controller')
+    assert [(route["controller_name"], route["endpoint"]) for route in routes] == [('root', '/:id'), ('root', '/'), ('status', '/')]
+    index = get_steps(plan, 'generate_controller_index')[0]
+    assert build_route_table(index["controller_names"], index["mounts"]) == [('status', '/status'), ('root', '/')]
+
+
+def test_duplicate_and_missing_operation_ids_get_unique_names():
+    plan = compile_spec(make_spec({'/users': {'get': 'getUser'}, '/accounts': {'get': 'getUser', 'post': None}}))
+    names = [service["service_name"] for service in get_steps(plan, 'generate_service')]
+    assert names == ['getUser', 'getUser2', 'postAccounts']
+    assert get_steps(plan, 'generate_services_index') == [{"service_names": names}]
+
+
+def test_reserved_words_are_renamed():
+    plan = compile_spec(make_spec({'/delete': {'get': 'delete'}}))
+    assert [service["service_name"] for service in get_steps(plan, 'generate_service')] == ['deleteService']
+    assert get_steps(plan, 'generate_controller')[0]["controller_name"] == 'deleteController'
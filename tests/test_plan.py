@@ -0,0 +1,54 @@
+import pytest
+from lib.openapi import compile_spec
+from lib.plan import merge_plans, check_routes, InvalidPlanError
+
+
+def make_spec(url, path, operation_id):
+    operation = {'operationId': operation_id, 'responses': {'200': {'description': 'OK'}}}
+    return {'openapi': '3.0.0', 'info': {'title': 'api'}, 'servers': [{'url': url}], 'paths': {path: {'get': operation}}}
+
+
+def get_steps(plan, name):
+    return [step["args"] for step in plan if step["name"] == name]
+
+
+def test_steps_are_ordered_and_singletons_kept_once():
+    plan = merge_plans([
+        [{"name": "generate_service", "args": {"service_name": "a", "uri": "http://a"}}, {"name": "create_project_folder", "args": {"project_name": "one"}}],
+        [{"name": "create_project_folder", "args": {"project_name": "two"}}],
+    ])
+    assert [step["name"] for step in plan] == ['create_project_folder', 'generate_service']
+    assert get_steps(plan, 'create_project_folder') == [{"project_name": "one"}]
+
+
+def test_identical_services_and_routes_are_merged():
+    spec = make_spec('http://a', '/users/{id}', 'getUser')
+    plan = merge_plans([compile_spec(spec), compile_spec(spec)])
+    assert len(get_steps(plan, 'generate_service')) == 1
+    assert len(get_steps(plan, 'generate_controller')) == 1
+    assert get_steps(plan, 'generate_controller_index') == [{"controller_names": ['users'], "mounts": {'users': '/users'}}]
+
+
+def test_services_of_the_same_name_calling_other_upstreams_are_renamed():
+    plan = merge_plans([
+        compile_spec(make_spec('http://a', '/users/{id}', 'getUser')),
+        compile_spec(make_spec('http://b', '/accounts/{id}', 'getUser')),
+    ])
+    services = {service["service_name"]: service["uri"] for service in get_steps(plan, 'generate_service')}
+    assert services == {'getUser': 'http://a/users/${params.id}', 'getUser2': 'http://b/accounts/${params.id}'}
+    routes = {route["controller_name"]: route["services"] for route in get_steps(plan, 'generate_controller')}
+    assert routes == {'users': ['getUser'], 'accounts': ['getUser2']}
+    assert get_steps(plan, 'generate_services_index') == [{"service_names": ['getUser', 'getUser2']}]
+
+
+def test_route_collisions_are_found_before_execution():
+    plan = [{"name": "generate_controller_index", "args": {"controller_names": ['user', 'getUser']}}]
+    with pytest.raises(InvalidPlanError, match='both route to /user'):
+        check_routes(plan)
+
+
+def test_radix_endpoints_are_checked_before_execution():
+    plan = [{"name": "generate_controller", "args": {"controller_name": 'users', "endpoint": '/:id?'}}]
+    check_routes(plan)
+    with pytest.raises(InvalidPlanError):
+        check_routes(plan, 'radix')
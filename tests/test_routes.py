@@ -0,0 +1,47 @@
+import pytest
+from lib.routes import to_route_name, build_route_table, check_radix_endpoint
+
+
+def test_route_names_strip_only_a_leading_get_and_trailing_controller():
+    assert to_route_name('getUserPosts') == 'user-posts'
+    assert to_route_name('userController') == 'user'
+    assert to_route_name('widgetItems') == 'widget-items'
+    assert to_route_name('budgetLines') == 'budget-lines'
+
+
+def test_controllers_are_mounted_at_their_singular_in_the_order_given():
+    assert build_route_table(['userPosts', 'comments']) == [('userPosts', '/user-post'), ('comments', '/comment')]
+
+
+def test_repeated_controllers_are_mounted_once():
+    assert build_route_table(['users', 'users']) == [('users', '/user')]
+
+
+@pytest.mark.parametrize('names', [['user', 'users'], ['users', 'user']])
+def test_singular_controller_keeps_the_shared_path(names):
+    assert dict(build_route_table(names)) == {'user': '/user', 'users': '/users'}
+
+
+def test_controllers_without_a_free_path_are_rejected():
+    with pytest.raises(ValueError, match='both route to /user'):
+        build_route_table(['user', 'getUser'])
+
+
+def test_explicit_mounts_are_used_as_given():
+    assert build_route_table(['users', 'status'], {'users': '/users', 'status': '/status'}) == [('users', '/users'), ('status', '/status')]
+
+
+def test_explicit_mounts_must_be_unique():
+    with pytest.raises(ValueError, match='both mounted at /users'):
+        build_route_table(['users', 'accounts'], {'users': '/users', 'accounts': '/users'})
+
+
+def test_root_mount_comes_after_static_mounts():
+    table = build_route_table(['root', 'status', 'users'], {'root': '/', 'status': '/status'})
+    assert table == [('status', '/status'), ('users', '/user'), ('root', '/')]
+
+
+def test_radix_endpoints_only_allow_static_and_param_segments():
+    check_radix_endpoint('/:id/posts/:postId')
+    with pytest.raises(ValueError):
+        check_radix_endpoint('/:id?')